@@ -1,3 +1,33 @@
-from .fb_page_insight import FBPageInsight, FBPageInsightConst
-from .fb_page_insight import PostDefaultWebInsight, PageDefaultWebInsight
-from .fb_page_insight import PageWebInsightData, PostsWebInsightData, DatePreset, Period
+# NOTE: submodules are imported on first attribute access (PEP 562), so importing this package is cheap
+import importlib
+
+_attribute_module_dict = {
+    'FBPageInsight': '.fb_page_insight',
+    'FBPageInsightConst': '.fb_page_insight',
+    'PostDefaultWebInsight': '.fb_page_insight',
+    'PageDefaultWebInsight': '.fb_page_insight',
+    'PageWebInsightData': '.fb_page_insight',
+    'PostsWebInsightData': '.fb_page_insight',
+    'DatePreset': '.fb_page_insight',
+    'Period': '.fb_page_insight',
+    'SharedState': '.shared_state',
+    'ResponseCache': '.response_cache',
+    'CompactPostInsights': '.compact',
+    'CompactPageInsights': '.compact',
+    'AdaptiveConcurrencyController': '.concurrency',
+}
+
+__all__ = list(_attribute_module_dict)
+
+
+def __getattr__(name: str):
+    module_name = _attribute_module_dict.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
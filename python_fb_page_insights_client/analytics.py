@@ -0,0 +1,206 @@
+""" NumPy helpers over post/page web insights, need the analytics extra: `pip install python-fb-page-insights-client[analytics]` """
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError as e:
+    raise ImportError(
+        "numpy is needed for analytics, install python-fb-page-insights-client[analytics]") from e
+
+from .compact import CompactPageInsights, CompactPostInsights, MISSING
+from .fb_page_insight import PageWebInsightData, PostData, PostsWebInsightData
+
+REACTION_FIELD_LIST = ['likes_like', 'likes_love', 'likes_wow', 'likes_haha']
+
+
+def _int_column_to_float(values) -> "np.ndarray":
+    ''' None/MISSING -> nan '''
+    column = np.array([MISSING if v is None else v for v in values], dtype=np.int64) \
+        if isinstance(values, list) else np.frombuffer(values, dtype=np.int64)
+    result = column.astype(np.float64)
+    result[column == MISSING] = np.nan
+    return result
+
+
+def _iso_to_datetime64(value_list: Sequence[Optional[str]]) -> "np.ndarray":
+    return np.array([v if v is not None else 'NaT' for v in value_list], dtype='datetime64[us]')
+
+
+def _safe_divide(numerator: "np.ndarray", denominator: "np.ndarray") -> "np.ndarray":
+    ''' nan if denominator is 0 or nan '''
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = numerator / denominator
+    result[~(denominator > 0)] = np.nan
+    return result
+
+
+class InsightFrame:
+    """ float64 metric columns (nan for metrics fb did not return) + page id and time of each row """
+
+    def __init__(self, column_dict: Dict[str, "np.ndarray"], id_list: List[str], page_id_list: List[str],
+                 time_column: "np.ndarray"):
+        self.column_dict = column_dict
+        self.id_list = id_list
+        self.page_id_list = page_id_list
+        # datetime64, NaT if unknown
+        self.time_column = time_column
+
+    def __len__(self):
+        return len(self.id_list)
+
+    def column(self, metric: str) -> "np.ndarray":
+        return self.column_dict[metric]
+
+    def _group_key_list(self, by: str):
+        ''' return (labels, index of each row in labels, -1 if unknown) '''
+        if by == 'page':
+            labels, inverse = np.unique(
+                np.array(self.page_id_list, dtype=object).astype(str), return_inverse=True)
+            return [str(e) for e in labels], inverse.reshape(-1)
+        valid = ~np.isnat(self.time_column)
+        days = self.time_column.astype('datetime64[D]')
+        if by == 'week':
+            # 1970-01-01 is Thursday, key is the Monday of the week
+            day_number = days.astype(np.int64)
+            keys = (days - ((day_number + 3) % 7)).astype('datetime64[D]')
+        elif by == 'month':
+            keys = days.astype('datetime64[M]')
+        else:
+            raise ValueError("by should be page, week or month")
+        labels, inverse = np.unique(keys[valid], return_inverse=True)
+        index = np.full(len(self), -1, dtype=np.int64)
+        index[valid] = inverse.reshape(-1)
+        return [str(e) for e in labels], index
+
+    def group_by(self, metric: str, by: str = 'page', agg: str = 'sum') -> Dict[str, float]:
+        """ by: page/week/month, agg: sum/mean/count/max/min. nan values are skipped """
+        labels, index = self._group_key_list(by)
+        values = self.column(metric)
+        mask = (index >= 0) & ~np.isnan(values)
+        index = index[mask]
+        values = values[mask]
+        group_count = len(labels)
+        count = np.bincount(index, minlength=group_count).astype(np.float64)
+        if agg == 'count':
+            result = count
+        elif agg in ('sum', 'mean'):
+            result = np.bincount(index, weights=values,
+                                 minlength=group_count)
+            if agg == 'mean':
+                result = _safe_divide(result, count)
+        elif agg == 'max':
+            result = np.full(group_count, -np.inf)
+            np.maximum.at(result, index, values)
+            result[count == 0] = np.nan
+        elif agg == 'min':
+            result = np.full(group_count, np.inf)
+            np.minimum.at(result, index, values)
+            result[count == 0] = np.nan
+        else:
+            raise ValueError("agg should be sum, mean, count, max or min")
+        return dict(zip(labels, result.tolist()))
+
+    def top_n(self, metric: str, n: int = 10) -> List[str]:
+        """ ids of the n rows with the largest metric, nan is skipped """
+        if n <= 0:
+            return []
+        values = self.column(metric)
+        valid_index = np.flatnonzero(~np.isnan(values))
+        if n < len(valid_index):
+            candidate = valid_index[np.argpartition(-values[valid_index], n)[:n]]
+        else:
+            candidate = valid_index
+        order = candidate[np.argsort(-values[candidate], kind='stable')]
+        return [self.id_list[i] for i in order]
+
+    def percentiles(self, metric: str, q: Sequence[float] = (50, 90, 99)) -> Dict[float, float]:
+        values = self.column(metric)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return {e: float('nan') for e in q}
+        return dict(zip(q, np.percentile(values, q).tolist()))
+
+
+class PostInsightFrame(InsightFrame):
+    """ rows are posts, time is post created_time """
+
+    @classmethod
+    def from_web_insight(cls, data: PostsWebInsightData):
+        return cls._build([e.post_id for e in data.insight_list], data.post_list,
+                          {field: _int_column_to_float([getattr(e, field) for e in data.insight_list])
+                           for field in CompactPostInsights.int_field_list})
+
+    @classmethod
+    def from_compact(cls, compact: CompactPostInsights, post_list: List[PostData]):
+        id_list = [compact.string_pool.get(i)
+                   for i in compact.column('post_id')]
+        return cls._build(id_list, post_list,
+                          {field: _int_column_to_float(compact.column(field))
+                           for field in CompactPostInsights.int_field_list})
+
+    @classmethod
+    def _build(cls, id_list: List[str], post_list: List[PostData], column_dict: Dict[str, "np.ndarray"]):
+        post_dict = {post.id: post for post in post_list}
+        page_id_list = []
+        created_time_list = []
+        for post_id in id_list:
+            post = post_dict.get(post_id)
+            if post is not None and post.page_id:
+                page_id_list.append(post.page_id)
+            else:
+                # post id is page_id + _ + id
+                page_id_list.append(post_id.split('_')[0])
+            created_time_list.append(
+                post.created_time if post is not None else None)
+        return cls(column_dict, id_list, page_id_list, _iso_to_datetime64(created_time_list))
+
+    def engagement_rate(self) -> "np.ndarray":
+        ''' (post clicks + activity) / reach, nan if fb returned neither of them '''
+        post_clicks = self.column('engagement_post_clicks')
+        activity = self.column('engagement_activity')
+        engagement = np.where(np.isnan(post_clicks) & np.isnan(activity), np.nan,
+                              np.nan_to_num(post_clicks) + np.nan_to_num(activity))
+        return _safe_divide(engagement, self.column('reach'))
+
+    def click_through_rate(self) -> "np.ndarray":
+        ''' link_clicks / reach '''
+        return _safe_divide(self.column('link_clicks'), self.column('reach'))
+
+    def reaction_mix(self) -> Dict[str, "np.ndarray"]:
+        ''' share of each reaction in the reaction total of each post, missing reactions count as 0 '''
+        reaction_matrix = np.nan_to_num(
+            np.vstack([self.column(field) for field in REACTION_FIELD_LIST]))
+        total = reaction_matrix.sum(axis=0)
+        return {field: _safe_divide(reaction_matrix[i], total) for i, field in enumerate(REACTION_FIELD_LIST)}
+
+    def with_rates(self):
+        ''' add engagement_rate & click_through_rate columns, so they can be used in group_by/top_n/percentiles '''
+        self.column_dict['engagement_rate'] = self.engagement_rate()
+        self.column_dict['click_through_rate'] = self.click_through_rate()
+        return self
+
+
+class PageInsightFrame(InsightFrame):
+    """ rows are page insight values, time is end_time """
+
+    @classmethod
+    def from_web_insight(cls, data: PageWebInsightData):
+        insight_list = data.insight_list or []
+        return cls({field: _int_column_to_float([getattr(e, field) for e in insight_list])
+                    for field in CompactPageInsights.int_field_list},
+                   [f'{e.page_id}_{e.end_time}' for e in insight_list],
+                   [e.page_id for e in insight_list],
+                   _iso_to_datetime64([e.end_time for e in insight_list]))
+
+    @classmethod
+    def from_compact(cls, compact: CompactPageInsights):
+        page_id_list = [compact.string_pool.get(i)
+                        for i in compact.column('page_id')]
+        # MISSING is the same int64 as NaT
+        time_column = np.frombuffer(compact.column(
+            'end_time'), dtype=np.int64).astype('datetime64[us]')
+        return cls({field: _int_column_to_float(compact.column(field))
+                    for field in CompactPageInsights.int_field_list},
+                   [f'{page_id}_{e}' for page_id, e in zip(
+                       page_id_list, time_column.astype(str))],
+                   page_id_list, time_column)
@@ -0,0 +1,196 @@
+import argparse
+import os
+import sys
+from datetime import date, datetime
+from typing import List, Tuple
+
+from .fb_page_insight import FBPageInsight, Period
+from .export import ExportJournal, ExportKind, Exporter, build_export_units
+from .planner import BackfillPlan, BackfillPlanner, run_plan
+from .daemon import JSONLinesSink, PollingDaemon, PrintSink
+
+
+def _parse_date(value: str) -> date:
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def _parse_date_range(value: str) -> Tuple[date, date]:
+    ''' e.g. 2021-01-01:2021-07-01, until is excluded '''
+    try:
+        since, until = value.split(':')
+        since, until = _parse_date(since), _parse_date(until)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"date range should be SINCE:UNTIL, e.g. 2021-01-01:2021-07-01, got {value}")
+    if since >= until:
+        raise argparse.ArgumentTypeError(
+            f"since should be before until, got {value}")
+    return since, until
+
+
+def _add_export_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--page-id', dest='page_id_list', action='append', default=[],
+                        help='page id, can be repeated. default is fb_default_page_id')
+    parser.add_argument('--date-range', dest='date_range_list', action='append', type=_parse_date_range, required=True,
+                        help='SINCE:UNTIL in YYYY-MM-DD, until is excluded. can be repeated')
+    parser.add_argument('--kind', dest='kind_list', action='append', choices=[e.value for e in ExportKind],
+                        help='page and/or post, default is both')
+    parser.add_argument('--period', default=Period.week.name,
+                        choices=[Period.day.name, Period.week.name,
+                                 Period.days_28.name, Period.month.name],
+                        help='period of page insights')
+    parser.add_argument('--shard-days', type=int, default=30,
+                        help='split each date range into files of at most this many days, at most 93 for page insights')
+    parser.add_argument('--out-dir', default='fb_insights_export')
+    parser.add_argument('--journal', default=None,
+                        help='checkpoint journal, default is OUT_DIR/journal.jsonl')
+    parser.add_argument('--concurrency', type=int, default=1)
+
+
+def _build_units(fb: FBPageInsight, args):
+    page_id_list: List[str] = args.page_id_list or [fb.fb_default_page_id]
+    if not all(page_id_list):
+        raise ValueError("--page-id or fb_default_page_id should be assigned")
+    kind_list = [ExportKind(e) for e in (args.kind_list or [
+        ExportKind.page.value, ExportKind.post.value])]
+    return build_export_units(page_id_list, args.date_range_list, kind_list, args.shard_days)
+
+
+def export_command(args) -> int:
+    fb = FBPageInsight()
+    unit_list = _build_units(fb, args)
+    journal = ExportJournal(args.journal or os.path.join(
+        args.out_dir, 'journal.jsonl'))
+    os.makedirs(args.out_dir, exist_ok=True)
+    exporter = Exporter(fb, args.out_dir, journal,
+                        args.concurrency, Period[args.period])
+    stats = exporter.run(unit_list)
+    print(f"export finish: {stats.done} done, {stats.skipped} skipped, {stats.failed} failed, "
+          f"{stats.row_count} rows in {stats.elapsed_seconds:.1f}s")
+    if stats.failed > 0:
+        print("rerun the same command to retry the failed units")
+        return 1
+    return 0
+
+
+def plan_command(args) -> int:
+    fb = FBPageInsight()
+    unit_list = _build_units(fb, args)
+    planner = BackfillPlanner(
+        fb, args.hourly_request_budget, args.posts_per_day)
+    plan = planner.plan(unit_list, dry_run=args.dry_run)
+    # run-plan exports with the same settings
+    plan.period = args.period
+    plan.out_dir = args.out_dir
+    plan.journal = args.journal
+    plan.concurrency = args.concurrency
+    print(plan.summary())
+    for shard in plan.shard_list:
+        print(f"shard {shard.index}: {len(shard.planned_unit_list)} units, "
+              f"about {shard.estimated_request_count} requests")
+    plan_file = args.plan_file or os.path.join(args.out_dir, 'plan.json')
+    os.makedirs(os.path.dirname(plan_file) or '.', exist_ok=True)
+    plan.save(plan_file)
+    print(f"plan saved to {plan_file}, run it by `fb-page-insights run-plan --plan-file {plan_file}`")
+    return 0
+
+
+def run_plan_command(args) -> int:
+    plan = BackfillPlan.load(args.plan_file)
+    # arguments override the settings saved in the plan
+    out_dir = args.out_dir or plan.out_dir
+    journal = ExportJournal(args.journal or plan.journal or os.path.join(
+        out_dir, 'journal.jsonl'))
+    os.makedirs(out_dir, exist_ok=True)
+    exporter = Exporter(FBPageInsight(), out_dir, journal,
+                        args.concurrency or plan.concurrency, Period[args.period or plan.period])
+    failed_count_dict = run_plan(
+        plan, exporter, wait_between_shards=not args.no_wait)
+    failed_count = sum(failed_count_dict.values())
+    if failed_count > 0:
+        print(
+            f"{failed_count} units failed, rerun the same command to retry them")
+        return 1
+    print("plan finish")
+    return 0
+
+
+def poll_command(args) -> int:
+    fb = FBPageInsight()
+    page_id_list: List[str] = args.page_id_list or [fb.fb_default_page_id]
+    if not all(page_id_list):
+        raise ValueError("--page-id or fb_default_page_id should be assigned")
+    sink = JSONLinesSink(args.output) if args.output else PrintSink()
+    daemon = PollingDaemon(fb, page_id_list, sink, args.page_interval, args.post_interval,
+                           args.jitter, args.recent_post_days, period=Period[args.period])
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        daemon.stop()
+    print(f"poll stop: {daemon.run_count} polls, {daemon.error_count} errors")
+    return 0
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='fb-page-insights', description='facebook page insights client')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    export_parser = subparsers.add_parser(
+        'export', help='export page and post web insights to json files, resumable')
+    _add_export_arguments(export_parser)
+    export_parser.set_defaults(func=export_command)
+
+    plan_parser = subparsers.add_parser(
+        'plan', help='estimate the request count of an export and split it into hourly shards')
+    _add_export_arguments(plan_parser)
+    plan_parser.add_argument('--hourly-request-budget', type=int, default=200,
+                             help='200 requests/hour/token for a user access token')
+    plan_parser.add_argument('--posts-per-day', type=float, default=1.0,
+                             help='used to estimate the post count in dry run')
+    plan_parser.add_argument('--dry-run', action='store_true',
+                             help='no api call, estimate post count by --posts-per-day instead of get_posts')
+    plan_parser.add_argument('--plan-file', default=None,
+                             help='default is OUT_DIR/plan.json')
+    plan_parser.set_defaults(func=plan_command)
+
+    run_plan_parser = subparsers.add_parser(
+        'run-plan', help='run a plan shard by shard, resumable')
+    run_plan_parser.add_argument('--plan-file', required=True)
+    run_plan_parser.add_argument(
+        '--period', default=None, choices=[Period.day.name, Period.week.name, Period.days_28.name, Period.month.name],
+        help='default is the one saved in the plan')
+    run_plan_parser.add_argument('--out-dir', default=None,
+                                 help='default is the one saved in the plan')
+    run_plan_parser.add_argument('--journal', default=None,
+                                 help='default is the one saved in the plan, or OUT_DIR/journal.jsonl')
+    run_plan_parser.add_argument('--concurrency', type=int, default=None,
+                                 help='default is the one saved in the plan')
+    run_plan_parser.add_argument('--no-wait', action='store_true',
+                                 help='do not wait one hour between shards')
+    run_plan_parser.set_defaults(func=run_plan_command)
+
+    poll_parser = subparsers.add_parser(
+        'poll', help='keep polling page insights and recent post insights')
+    poll_parser.add_argument('--page-id', dest='page_id_list', action='append', default=[],
+                             help='page id, can be repeated. default is fb_default_page_id')
+    poll_parser.add_argument('--page-interval', type=float, default=3600,
+                             help='seconds between two page insights polls of a page')
+    poll_parser.add_argument('--post-interval', type=float, default=3600,
+                             help='seconds between two recent post insights polls of a page')
+    poll_parser.add_argument('--jitter', type=float, default=0.1,
+                             help='random ratio added to each interval')
+    poll_parser.add_argument('--recent-post-days', type=int, default=7)
+    poll_parser.add_argument(
+        '--period', default=Period.day.name, choices=[Period.day.name, Period.week.name, Period.days_28.name, Period.month.name])
+    poll_parser.add_argument('--output', default=None,
+                             help='json lines file, default is printing to stdout')
+    poll_parser.set_defaults(func=poll_command)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
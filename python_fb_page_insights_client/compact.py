@@ -0,0 +1,152 @@
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Type, Union
+
+from pydantic import BaseModel
+
+from .fb_page_insight import PageDefaultWebInsight, PostDefaultWebInsight
+
+# None in int/time columns
+MISSING = -2 ** 63
+# None in string columns
+MISSING_STR_INDEX = -1
+
+# naive datetime, so isoformat strings (which are naive here) convert to/from epoch exactly, whatever the local time zone is
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _iso_to_epoch_us(value: Optional[str]) -> int:
+    if value is None:
+        return MISSING
+    delta = datetime.fromisoformat(value) - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def _epoch_us_to_iso(value: int) -> Optional[str]:
+    if value == MISSING:
+        return None
+    return (_EPOCH + timedelta(microseconds=value)).isoformat()
+
+
+class StringPool:
+    """ intern strings (post/page id, period) as int index """
+
+    def __init__(self):
+        self.string_list: List[str] = []
+        self._index_dict: Dict[str, int] = {}
+
+    def index(self, value: Optional[str]) -> int:
+        if value is None:
+            return MISSING_STR_INDEX
+        i = self._index_dict.get(value)
+        if i is None:
+            i = len(self.string_list)
+            self.string_list.append(value)
+            self._index_dict[value] = i
+        return i
+
+    def get(self, i: int) -> Optional[str]:
+        if i == MISSING_STR_INDEX:
+            return None
+        return self.string_list[i]
+
+
+class CompactInsights:
+    """ struct-of-arrays container of insight models, e.g. PostDefaultWebInsight
+
+        strings are interned into a StringPool, date-time strings are stored as epoch microseconds,
+        and the other fields are int64 columns. None is stored as MISSING.
+        models are only created when iterating/indexing, by `model.construct` without validation
+    """
+    model: Type[BaseModel] = None
+    str_field_list: List[str] = []
+    time_field_list: List[str] = []
+    int_field_list: List[str] = []
+
+    def __init__(self, string_pool: StringPool = None):
+        self.string_pool = string_pool or StringPool()
+        self.column_dict: Dict[str, array] = {}
+        for field in self.str_field_list:
+            self.column_dict[field] = array('i')
+        for field in self.time_field_list + self.int_field_list:
+            self.column_dict[field] = array('q')
+
+    @classmethod
+    def from_models(cls, insight_list: Iterable[BaseModel]):
+        compact = cls()
+        compact.extend(insight_list)
+        return compact
+
+    def append(self, insight: BaseModel):
+        for field in self.str_field_list:
+            self.column_dict[field].append(
+                self.string_pool.index(getattr(insight, field)))
+        for field in self.time_field_list:
+            self.column_dict[field].append(
+                _iso_to_epoch_us(getattr(insight, field)))
+        for field in self.int_field_list:
+            value = getattr(insight, field)
+            self.column_dict[field].append(MISSING if value is None else value)
+
+    def extend(self, insight_list: Iterable[BaseModel]):
+        for insight in insight_list:
+            self.append(insight)
+
+    def __len__(self):
+        # every class has at least one string field
+        return len(self.column_dict[self.str_field_list[0]])
+
+    def _to_model(self, i: int):
+        values = {}
+        for field in self.str_field_list:
+            values[field] = self.string_pool.get(self.column_dict[field][i])
+        for field in self.time_field_list:
+            values[field] = _epoch_us_to_iso(self.column_dict[field][i])
+        for field in self.int_field_list:
+            value = self.column_dict[field][i]
+            values[field] = None if value == MISSING else value
+        return self.model.construct(**values)
+
+    def __getitem__(self, key: Union[int, slice]):
+        if isinstance(key, slice):
+            compact = self.__class__(self.string_pool)
+            for field, column in self.column_dict.items():
+                compact.column_dict[field] = column[key]
+            return compact
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("index out of range")
+        return self._to_model(key)
+
+    def __iter__(self) -> Iterator[BaseModel]:
+        for i in range(len(self)):
+            yield self._to_model(i)
+
+    def to_models(self) -> List[BaseModel]:
+        return list(self)
+
+    def column(self, field: str) -> array:
+        ''' raw column, MISSING means None. string columns are StringPool indexes, time columns are epoch microseconds '''
+        return self.column_dict[field]
+
+    @property
+    def nbytes(self):
+        ''' bytes of columns, not including the string pool '''
+        return sum(column.itemsize * len(column) for column in self.column_dict.values())
+
+
+class CompactPostInsights(CompactInsights):
+    model = PostDefaultWebInsight
+    str_field_list = ['post_id', 'period']
+    time_field_list = ['query_time']
+    int_field_list = ['reach', 'engagement_post_clicks', 'engagement_activity', 'likes', 'comments', 'shares',
+                      'photo_views', 'link_clicks', 'other_clicks', 'likes_like', 'likes_love', 'likes_wow', 'likes_haha']
+
+
+class CompactPageInsights(CompactInsights):
+    model = PageDefaultWebInsight
+    str_field_list = ['page_id', 'period']
+    time_field_list = ['end_time']
+    int_field_list = ['actions_on_page', 'page_views', 'page_likes', 'post_engagement', 'videos',
+                      'page_followers', 'post_reach']
@@ -0,0 +1,104 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Deque
+from collections import deque
+
+
+class AdaptiveConcurrencyController:
+    """ AIMD limit of in-flight requests
+
+        - additive increase: +additive_increase per `limit` healthy responses, i.e. about +1 per round trip
+        - multiplicative decrease: limit * multiplicative_decrease on a throttle response, a latency spike
+          (latency > latency_spike_ratio * baseline latency) or when the error rate of the recent `window`
+          responses is more than error_rate_threshold. one decrease at most per baseline latency, so a burst
+          of throttle responses from the same round trip only cuts the limit once
+        requests more than the limit wait in acquire()
+    """
+
+    def __init__(self, initial_limit: float = 4, min_limit: float = 1, max_limit: float = 32,
+                 additive_increase: float = 1, multiplicative_decrease: float = 0.5,
+                 latency_spike_ratio: float = 2.0, ewma_alpha: float = 0.2,
+                 error_rate_threshold: float = 0.1, window: int = 20):
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError(
+                "should be 1 <= min_limit <= initial_limit <= max_limit")
+        if not 0 < multiplicative_decrease < 1:
+            raise ValueError("multiplicative_decrease should be in (0, 1)")
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.additive_increase = additive_increase
+        self.multiplicative_decrease = multiplicative_decrease
+        self.latency_spike_ratio = latency_spike_ratio
+        self.ewma_alpha = ewma_alpha
+        self.error_rate_threshold = error_rate_threshold
+
+        self.in_flight = 0
+        # EWMA of healthy response latency in seconds, None before the first one
+        self.baseline_latency: float = None
+        self.throttle_count = 0
+        self.decrease_count = 0
+
+        # True for error/throttle responses
+        self._recent_errors: Deque[bool] = deque(maxlen=window)
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def _decrease(self, now: float):
+        if self.baseline_latency is not None and now - self._last_decrease < self.baseline_latency:
+            return
+        self.limit = max(self.min_limit, self.limit *
+                         self.multiplicative_decrease)
+        self._last_decrease = now
+        self.decrease_count += 1
+
+    def release(self, latency: float, throttled: bool = False, error: bool = False):
+        ''' latency in seconds. throttled: fb rate limit error, error: e.g. network error '''
+        now = time.monotonic()
+        with self._condition:
+            self.in_flight -= 1
+            self._recent_errors.append(throttled or error)
+            error_rate = sum(self._recent_errors) / len(self._recent_errors)
+            spike = self.baseline_latency is not None and \
+                latency > self.baseline_latency * self.latency_spike_ratio
+            if throttled:
+                self.throttle_count += 1
+            if not throttled and not error:
+                # spikes are included too, so the baseline follows a lasting latency change
+                if self.baseline_latency is None:
+                    self.baseline_latency = latency
+                else:
+                    self.baseline_latency += self.ewma_alpha * \
+                        (latency - self.baseline_latency)
+            if throttled or spike or (error and error_rate > self.error_rate_threshold):
+                self._decrease(now)
+            elif not error:
+                if error_rate <= self.error_rate_threshold:
+                    self.limit = min(self.max_limit, self.limit +
+                                     self.additive_increase / self.limit)
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self):
+        """ with controller.slot() as result: ...; result["throttled"] = True if fb returns a rate limit error """
+        self.acquire()
+        result = {"throttled": False}
+        start = time.monotonic()
+        # also released on KeyboardInterrupt/SystemExit, otherwise the slot is lost forever
+        is_error = True
+        try:
+            yield result
+            is_error = False
+        finally:
+            if is_error:
+                self.release(time.monotonic() - start, error=True)
+            else:
+                self.release(time.monotonic() - start,
+                             throttled=result["throttled"])
@@ -0,0 +1,172 @@
+import heapq
+import json
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import Any, Dict, List
+
+from .fb_page_insight import FBPageInsight, DatePreset, Period, THROTTLE_ERROR_CODES
+
+
+class PollingKind(Enum):
+    page_insights = "page_insights"
+    post_insights = "post_insights"
+
+
+class PollThrottled(Exception):
+    """ fb returns a rate limit error, the next poll of the job is delayed """
+
+
+class InsightSink(ABC):
+    """ where PollingDaemon pushes results """
+
+    @abstractmethod
+    def write(self, kind: PollingKind, page_id: str, data: Dict[str, Any]):
+        pass
+
+
+class PrintSink(InsightSink):
+    def write(self, kind: PollingKind, page_id: str, data: Dict[str, Any]):
+        print(f"{datetime.now().isoformat()} {kind.value} {page_id}:{data}")
+
+
+class JSONLinesSink(InsightSink):
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, kind: PollingKind, page_id: str, data: Dict[str, Any]):
+        line = json.dumps({"kind": kind.value, "page_id": page_id, "fetch_time": int(time.time()),
+                           "data": data}, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+
+class PollingDaemon:
+    """ poll get_page_insights and get_post_insight of recent posts for each page, and push results to sink
+
+        - page_interval/post_interval: seconds between two polls of the same page
+        - jitter: each interval is randomly stretched/shrunk by this ratio, and the first polls are spread over
+          one interval, so pages do not fire in bursts
+        - recent_post_days: posts created within these days are polled
+        - throttle_backoff: when fb returns a rate limit error, the next interval of that job is multiplied by it,
+          again for each throttled poll in a row, up to max_backoff times. a successful poll resets it
+        one FBPageInsight is used in all cycles, so page tokens and connections are reused
+    """
+
+    def __init__(self, fb: FBPageInsight, page_id_list: List[str], sink: InsightSink,
+                 page_interval: float = 3600, post_interval: float = 3600, jitter: float = 0.1,
+                 recent_post_days: int = 7, date_preset: DatePreset = DatePreset.yesterday,
+                 period: Period = Period.day, rng: random.Random = None,
+                 throttle_backoff: float = 2.0, max_backoff: float = 16.0):
+        if len(page_id_list) == 0:
+            raise ValueError("page_id_list should not be empty")
+        if page_interval <= 0 or post_interval <= 0:
+            raise ValueError("interval should be positive")
+        if not 0 <= jitter < 1:
+            raise ValueError("jitter should be in [0, 1)")
+        if not 1 <= throttle_backoff <= max_backoff:
+            raise ValueError("should be 1 <= throttle_backoff <= max_backoff")
+        self.fb = fb
+        self.page_id_list = page_id_list
+        self.sink = sink
+        self.interval_dict = {PollingKind.page_insights: page_interval,
+                              PollingKind.post_insights: post_interval}
+        self.jitter = jitter
+        self.recent_post_days = recent_post_days
+        self.date_preset = date_preset
+        self.period = period
+        self.rng = rng or random.Random()
+        self.throttle_backoff = throttle_backoff
+        self.max_backoff = max_backoff
+
+        self.run_count = 0
+        self.error_count = 0
+        self.throttle_count = 0
+        # (kind, page_id) -> current interval multiplier
+        self._backoff_dict: Dict[tuple, float] = {}
+        self._stop_event = threading.Event()
+
+    def _next_interval(self, kind: PollingKind):
+        return self.interval_dict[kind] * (1 + self.rng.uniform(-self.jitter, self.jitter))
+
+    def poll_page_insights(self, page_id: str):
+        resp = self.fb.get_page_insights(
+            page_id, date_preset=self.date_preset, period=self.period)
+        if resp.error is not None:
+            if resp.error.code in THROTTLE_ERROR_CODES:
+                raise PollThrottled(resp.error.message)
+            raise ValueError(f"page insight error:{resp.error.message}")
+        self.sink.write(PollingKind.page_insights, page_id, resp.dict())
+
+    def poll_post_insights(self, page_id: str):
+        now = datetime.now()
+        since = int((now - timedelta(days=self.recent_post_days)).timestamp())
+        posts = self.fb.get_posts(page_id, since, int(now.timestamp()))
+        if posts.error is not None:
+            if posts.error.code in THROTTLE_ERROR_CODES:
+                raise PollThrottled(posts.error.message)
+            raise ValueError(f"posts error:{posts.error.message}")
+        post_insight_list = []
+        for i, post in enumerate(posts.data):
+            resp = self.fb.get_post_insight(post.id)
+            if resp.error is not None:
+                if resp.error.code in THROTTLE_ERROR_CODES:
+                    # keep what is already fetched, the remaining posts are polled next time
+                    self.sink.write(PollingKind.post_insights, page_id,
+                                    {"post_insight_list": post_insight_list,
+                                     "deferred_post_id_list": [e.id for e in posts.data[i:]]})
+                    raise PollThrottled(resp.error.message)
+                raise ValueError(f"post insight error:{resp.error.message}")
+            post_insight_list.append(
+                {"post": post.dict(), "insight": resp.dict()})
+        self.sink.write(PollingKind.post_insights, page_id,
+                        {"post_insight_list": post_insight_list})
+
+    def _poll(self, kind: PollingKind, page_id: str):
+        if kind == PollingKind.page_insights:
+            self.poll_page_insights(page_id)
+        else:
+            self.poll_post_insights(page_id)
+
+    def run(self, max_runs: int = None):
+        """ block until stop() is called, or max_runs polls are done """
+        now = time.time()
+        # (next run time, sequence, kind, page_id), sequence keeps the heap from comparing enums
+        job_heap = []
+        for kind in PollingKind:
+            for page_id in self.page_id_list:
+                heapq.heappush(job_heap, (now + self.rng.uniform(0, self.interval_dict[kind]),
+                                          len(job_heap), kind, page_id))
+
+        while not self._stop_event.is_set():
+            if max_runs is not None and self.run_count >= max_runs:
+                break
+            next_run_time, seq, kind, page_id = heapq.heappop(job_heap)
+            wait = next_run_time - time.time()
+            if wait > 0 and self._stop_event.wait(wait):
+                break
+            backoff = 1.0
+            try:
+                self._poll(kind, page_id)
+            except PollThrottled as e:
+                self.throttle_count += 1
+                backoff = min(self.max_backoff, self._backoff_dict.get(
+                    (kind, page_id), 1.0) * self.throttle_backoff)
+                print(
+                    f"poll {kind.value} of {page_id} is throttled:{e}, next interval x{backoff:g}")
+            except Exception as e:
+                self.error_count += 1
+                print(f"poll {kind.value} of {page_id} fail:{e}")
+            self._backoff_dict[(kind, page_id)] = backoff
+            self.run_count += 1
+            # schedule from the planned time instead of now, so slow requests do not make the schedule drift
+            heapq.heappush(job_heap, (max(next_run_time + self._next_interval(kind) * backoff, time.time()),
+                                      seq, kind, page_id))
+
+    def stop(self):
+        self._stop_event.set()
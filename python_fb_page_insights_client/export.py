@@ -0,0 +1,202 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+from enum import Enum
+from typing import List, Set, Tuple
+
+from pydantic import BaseModel
+
+from .fb_page_insight import FBPageInsight, Period
+
+# page insights accept at most 93 days between since and until, a page unit is one request
+MAX_PAGE_INSIGHT_DAYS = 93
+
+
+class ExportKind(Enum):
+    page = "page"
+    post = "post"
+
+
+class ExportUnit(BaseModel):
+    """ one request group of the export, e.g. the post web insight of a page in [since_date, until_date) """
+    page_id: str
+    kind: ExportKind
+    since_date: date
+    until_date: date
+
+    @property
+    def key(self):
+        return f'{self.kind.value}_{self.page_id}_{self.since_date.isoformat()}_{self.until_date.isoformat()}'
+
+    def output_key(self, period: Period):
+        ''' name of the output file and journal record, page insights of another period are another output '''
+        if self.kind == ExportKind.page:
+            return f'{self.key}_{period.name}'
+        return self.key
+
+
+def split_date_range(since: date, until: date, shard_days: int) -> List[Tuple[date, date]]:
+    """ split [since, until) into ranges of at most shard_days days """
+    if since >= until:
+        raise ValueError("since is more than until, not valid")
+    if shard_days < 1:
+        raise ValueError("shard_days should be at least 1")
+    date_range_list = []
+    shard_since = since
+    while shard_since < until:
+        shard_until = min(shard_since + timedelta(days=shard_days), until)
+        date_range_list.append((shard_since, shard_until))
+        shard_since = shard_until
+    return date_range_list
+
+
+def build_export_units(page_id_list: List[str], date_range_list: List[Tuple[date, date]],
+                       kind_list: List[ExportKind] = [ExportKind.page, ExportKind.post],
+                       shard_days: int = 30) -> List[ExportUnit]:
+    if ExportKind.page in kind_list and shard_days > MAX_PAGE_INSIGHT_DAYS:
+        raise ValueError(
+            f"shard_days should be at most {MAX_PAGE_INSIGHT_DAYS} for page units")
+    unit_list: List[ExportUnit] = []
+    for page_id in page_id_list:
+        for since, until in date_range_list:
+            for shard_since, shard_until in split_date_range(since, until, shard_days):
+                for kind in kind_list:
+                    unit_list.append(ExportUnit(page_id=page_id, kind=kind,
+                                                since_date=shard_since, until_date=shard_until))
+    return unit_list
+
+
+class ExportJournal:
+    """ append-only json lines file of finished unit keys, an interrupted export skips them when restarting """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done_key_set: Set[str] = set()
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # the last line might be broken if the process was killed while writing it
+                        continue
+                    self.done_key_set.add(record["key"])
+
+    def is_done(self, key: str):
+        return key in self.done_key_set
+
+    def mark_done(self, key: str, output_path: str, row_count: int):
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({"key": key, "output_path": output_path,
+                                    "row_count": row_count, "finished_at": int(time.time())}) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self.done_key_set.add(key)
+
+
+class ExportStats(BaseModel):
+    total: int = 0
+    skipped: int = 0
+    done: int = 0
+    failed: int = 0
+    row_count: int = 0
+    elapsed_seconds: float = 0
+
+
+class Exporter:
+    """ export page/post web insights of the units to json files in out_dir,
+        concurrency is the number of units exported at the same time """
+
+    def __init__(self, fb: FBPageInsight, out_dir: str, journal: ExportJournal,
+                 concurrency: int = 1, period: Period = Period.week):
+        if concurrency < 1:
+            raise ValueError("concurrency should be at least 1")
+        self.fb = fb
+        self.out_dir = out_dir
+        self.journal = journal
+        self.concurrency = concurrency
+        self.period = period
+
+    def is_done(self, unit: ExportUnit):
+        return self.journal.is_done(unit.output_key(self.period))
+
+    def _output_path(self, unit: ExportUnit):
+        return os.path.join(self.out_dir, f'{unit.output_key(self.period)}.json')
+
+    def export_unit(self, unit: ExportUnit) -> int:
+        since_date = (unit.since_date.year,
+                      unit.since_date.month, unit.since_date.day)
+        until_date = (unit.until_date.year,
+                      unit.until_date.month, unit.until_date.day)
+        if unit.kind == ExportKind.page:
+            data = self.fb.get_page_default_web_insight(unit.page_id, since_date, until_date,
+                                                        period=self.period, return_as_dict=True)
+        else:
+            data = self.fb.get_post_default_web_insight(
+                unit.page_id, since_date, until_date, return_as_dict=True)
+            if len(data.get("deferred_post_list") or []) > 0:
+                raise ValueError(
+                    f'{len(data["deferred_post_list"])} posts are deferred by rate limit')
+
+        output_path = self._output_path(unit)
+        # write to a temp file first, so a crash never leaves a half written output
+        tmp_path = output_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, output_path)
+
+        row_count = len(data.get("insight_list") or [])
+        self.journal.mark_done(unit.output_key(
+            self.period), output_path, row_count)
+        return row_count
+
+    def run(self, unit_list: List[ExportUnit]) -> ExportStats:
+        os.makedirs(self.out_dir, exist_ok=True)
+        stats = ExportStats(total=len(unit_list))
+        todo_list = [
+            unit for unit in unit_list if not self.is_done(unit)]
+        stats.skipped = stats.total - len(todo_list)
+        if stats.skipped > 0:
+            print(f"resume: {stats.skipped}/{stats.total} units already done")
+
+        start = time.time()
+        # get page tokens one by one first, token cache (db.json) is not safe for concurrent writes
+        failed_page_id_set = set()
+        for page_id in sorted({unit.page_id for unit in todo_list}):
+            try:
+                self.fb.get_page_long_lived_token(page_id)
+            except Exception as e:
+                # other pages can still be exported, units of this page are counted as failed
+                print(f"get page token of {page_id} fail:{e}")
+                failed_page_id_set.add(page_id)
+        if failed_page_id_set:
+            stats.failed = len(
+                [unit for unit in todo_list if unit.page_id in failed_page_id_set])
+            todo_list = [
+                unit for unit in todo_list if unit.page_id not in failed_page_id_set]
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            future_dict = {executor.submit(
+                self.export_unit, unit): unit for unit in todo_list}
+            for future in as_completed(future_dict):
+                unit = future_dict[future]
+                try:
+                    stats.row_count += future.result()
+                    stats.done += 1
+                except Exception as e:
+                    stats.failed += 1
+                    print(f"export {unit.key} fail:{e}")
+                elapsed = max(time.time() - start, 1e-6)
+                finished = stats.done + stats.failed
+                print(f"[{stats.skipped + finished}/{stats.total}] {unit.key} "
+                      f"{finished / elapsed:.2f} units/s {stats.row_count / elapsed:.1f} rows/s")
+        stats.elapsed_seconds = time.time() - start
+        return stats
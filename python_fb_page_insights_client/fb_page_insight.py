@@ -1,15 +1,24 @@
 from datetime import datetime, timedelta
-from typing import Any, List, Optional, Union, Dict, Tuple, Literal
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, List, Optional, Union, Dict, Tuple, Literal, Type
+import os
+import threading
 
-from pydantic import BaseModel, BaseSettings, Field, validator
+from pydantic import BaseModel, BaseSettings, Field, PrivateAttr, validator
 from enum import Enum, auto, IntEnum
-import requests
-from tinydb import TinyDB, Query
 
 import logging
-import http.client
+
+# NOTE: requests & tinydb are imported when they are used, to keep importing this module cheap
+
+from .scheduler import PostInsightScheduler, newest_created_time_first
+from .shared_state import SharedState
+from .response_cache import ResponseCache
+from .concurrency import AdaptiveConcurrencyController
 
 # debug only
+# import http.client
 # logging.basicConfig(level=logging.DEBUG)
 # http.client.HTTPConnection.debuglevel = 1
 
@@ -18,6 +27,14 @@ class FBPageInsightConst(IntEnum):
     default_between_days = 365
 
 
+# https://developers.facebook.com/docs/graph-api/overview/rate-limiting#error-codes
+THROTTLE_ERROR_CODES = (4, 17, 32, 613)
+
+# `fields` param of lean_mode, LeanInsightData fields.
+# /posts is not trimmed, its default fields are already the PostData ones (id, created_time, message, story)
+LEAN_INSIGHT_FIELDS = "name,period,values"
+
+
 class DatePreset(Enum):
     today = auto()
     yesterday = auto()
@@ -150,6 +167,13 @@ class InsightData(BaseModel):
     description: str
 
 
+class LeanInsightData(BaseModel):
+    ''' only the fields used by _organize_to_web_*_data_shape, requested by fields param in lean_mode '''
+    name: str
+    period: str
+    values: List[InsightsValue]
+
+
 class InsightsCursors(BaseModel):
     # not seen Optional case but add it just in case
     previous: Optional[str]  # similar query but add since & until
@@ -166,6 +190,12 @@ class InsightsResponse(BaseModel):
     error: Optional[DebugError]  # e.g. use invalid token
 
 
+class LeanInsightsResponse(BaseModel):
+    data: Optional[List[LeanInsightData]]
+    paging: Optional[InsightsCursors]
+    error: Optional[DebugError]
+
+
 class Category(BaseModel):
     id: str
     name: str
@@ -271,16 +301,19 @@ class PostsPaging(BaseModel):
 
 
 class PostsResponse(BaseModel):
-    data: List[PostData]
+    # empty if fb returns an error
+    data: List[PostData] = []
     # not see Optional case but add it just in case
     paging: Optional[PostsPaging]
+    error: Optional[DebugError]
 
 
 class PostCompositeData(BaseModel):
     # TODO: meta might not be a good name
     meta: PostData
-    insight_data: Optional[List[InsightData]]
-    insight_data_complement: Optional[List[InsightData]]
+    # LeanInsightData in lean_mode
+    insight_data: Optional[List[Union[InsightData, LeanInsightData]]]
+    insight_data_complement: Optional[List[Union[InsightData, LeanInsightData]]]
 
 
 class PageDefaultWebInsight(BaseModel):
@@ -322,6 +355,17 @@ class PartialJSONSchema(BaseModel):
     definitions: Optional[Dict[str, Dict]]  # Optional
 
 
+@lru_cache()
+def _cached_partial_json_schema(model: Type[BaseModel]) -> PartialJSONSchema:
+    ''' models do not change at runtime, build each schema once. the result is shared, do not modify it '''
+    return PartialJSONSchema(**model.schema())
+
+
+def _partial_json_schema(model: Type[BaseModel]) -> PartialJSONSchema:
+    ''' a copy for each result, so changing one result's schema does not change the others '''
+    return _cached_partial_json_schema(model).copy(deep=True)
+
+
 class PageWebInsightData(BaseModel):
     insight_list: Optional[List[PageDefaultWebInsight]]
     insight_json_schema: Optional[PartialJSONSchema]
@@ -363,6 +407,9 @@ class PostsWebInsightData(BaseModel):
     post_list: List[PostData] = []
     post_json_schema: Optional[PartialJSONSchema]
 
+    # posts skipped since the request budget ran out, highest priority first
+    deferred_post_list: List[PostData] = []
+
 
 class LongLivedResponse(BaseModel):
     access_token: Optional[str]
@@ -370,6 +417,34 @@ class LongLivedResponse(BaseModel):
     error: Optional[DebugError]
 
 
+# settings class -> (env file, env file mtime, encoding, environment variables), values
+# only the latest state of each class is kept
+_env_settings_cache: Dict[type, Tuple[tuple, Dict[str, Any]]] = {}
+
+
+def _cached_env_settings(env_settings):
+    ''' wrap pydantic env settings source, so .env is only read again when it or environment variables change '''
+    def source(settings: BaseSettings) -> Dict[str, Any]:
+        env_file = env_settings.env_file
+        # pydantic also accepts a list/tuple of env files
+        env_file_list = env_file if isinstance(
+            env_file, (list, tuple)) else [env_file]
+        env_file_mtime_list = []
+        for path in env_file_list:
+            try:
+                env_file_mtime_list.append(os.stat(path).st_mtime_ns)
+            except (OSError, TypeError):
+                env_file_mtime_list.append(None)
+        state = (tuple(str(e) for e in env_file_list), tuple(env_file_mtime_list),
+                 env_settings.env_file_encoding, dict(os.environ))
+        entry = _env_settings_cache.get(settings.__class__)
+        if entry is None or entry[0] != state:
+            entry = (state, env_settings(settings))
+            _env_settings_cache[settings.__class__] = entry
+        return dict(entry[1])
+    return source
+
+
 class FBPageInsight(BaseSettings):
     fb_page_access_token_dict: Optional[Dict[str, str]]
     fb_app_id = ""
@@ -378,15 +453,37 @@ class FBPageInsight(BaseSettings):
     fb_default_page_id = ""
     fb_default_page_access_token = ""
 
+    # a local sqlite file to share page tokens/usage/request budget between processes on the same host
+    fb_shared_state_path = ""
+    # max requests per hour shared by all processes using the same fb_shared_state_path, 0 means no limit
+    fb_hourly_request_budget = 0
+
+    _shared_state: Optional[SharedState] = PrivateAttr(None)
+    _response_cache: Optional[ResponseCache] = PrivateAttr(None)
+    _concurrency_controller: Optional[AdaptiveConcurrencyController] = PrivateAttr(
+        None)
+    # keep-alive connections reused by all requests of this instance
+    _session: Any = PrivateAttr(None)  # requests.Session
+    # shard/export threads may send the first request at the same time
+    _session_lock: Any = PrivateAttr(default_factory=threading.Lock)
+
     # https://developers.facebook.com/docs/graph-api/reference/v10.0/insights
     # field(init=False, default='https://graph.facebook.com')
     api_server = 'https://graph.facebook.com'
     api_version = 'v10.0'
 
+    # request only the insight fields which are used via `fields` param and parse insights into LeanInsightsResponse,
+    # to cut response size, parse time and memory of large pulls
+    lean_mode = False
+
     class Config:
         env_file = '.env'
         env_file_encoding = 'utf-8'
 
+        @classmethod
+        def customise_sources(cls, init_settings, env_settings, file_secret_settings):
+            return init_settings, _cached_env_settings(env_settings), file_secret_settings
+
     # class Config:
     #     env_file = ".env"
 
@@ -410,6 +507,63 @@ class FBPageInsight(BaseSettings):
     def api_url(self):
         return f'{self.api_server}/{self.api_version}'
 
+    @property
+    def shared_state(self) -> Optional[SharedState]:
+        if self._shared_state is None and self.fb_shared_state_path:
+            self._shared_state = SharedState(self.fb_shared_state_path)
+        return self._shared_state
+
+    def use_shared_state(self, shared_state: SharedState):
+        self._shared_state = shared_state
+        return self
+
+    def use_response_cache(self, response_cache: Optional[ResponseCache]):
+        ''' None to disable the cache '''
+        self._response_cache = response_cache
+        return self
+
+    def use_concurrency_controller(self, concurrency_controller: Optional[AdaptiveConcurrencyController]):
+        ''' limit in-flight requests of this instance (e.g. get_posts shards, export concurrency) adaptively, None to disable '''
+        self._concurrency_controller = concurrency_controller
+        return self
+
+    def _get_cached_json(self, endpoint: str, key: str, url: str, page_id: str = None):
+        if self._response_cache is None:
+            return self._get_json(url, page_id)
+        return self._response_cache.get_or_fetch(endpoint, key, lambda: self._get_json(url, page_id))
+
+    def _get_session(self):
+        ''' create the session on the first request, so importing requests is deferred '''
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import requests
+                    self._session = requests.Session()
+        return self._session
+
+    def _get_json(self, url: str, page_id: str = None):
+        ''' all graph api requests go through here '''
+        shared_state = self.shared_state
+        if shared_state is not None and self.fb_hourly_request_budget > 0:
+            # refill the whole budget in one hour
+            shared_state.acquire(f'app:{self.fb_app_id}', self.fb_hourly_request_budget,
+                                 self.fb_hourly_request_budget / 3600)
+        session = self._get_session()
+        if self._concurrency_controller is None:
+            json_dict = session.get(url).json()
+        else:
+            with self._concurrency_controller.slot() as result:
+                json_dict = session.get(url).json()
+                error = json_dict.get("error") if isinstance(
+                    json_dict, dict) else None
+                result["throttled"] = isinstance(
+                    error, dict) and error.get("code") in THROTTLE_ERROR_CODES
+        if shared_state is not None:
+            shared_state.add_usage(f'app:{self.fb_app_id}')
+            if page_id:
+                shared_state.add_usage(f'page:{page_id}')
+        return json_dict
+
     def _page_id(self, page_id: str):
         if page_id is None:
             used_page_id = self.fb_default_page_id
@@ -423,8 +577,7 @@ class FBPageInsight(BaseSettings):
         if self.fb_app_id == "" or self.fb_app_secret == "":
             return ""
         url = f'{self.api_url}/oauth/access_token?grant_type=fb_exchange_token&client_id={self.fb_app_id}&client_secret={self.fb_app_secret}&fb_exchange_token={access_token}'
-        r = requests.get(url)
-        json_dict = r.json()
+        json_dict = self._get_json(url)
         resp = LongLivedResponse(**json_dict)
         if resp.error is not None:
             raise ValueError(
@@ -455,6 +608,28 @@ class FBPageInsight(BaseSettings):
             return False
         return True
 
+    def _load_cached_page_token(self, target_page_id: str):
+        if self.shared_state is not None:
+            return self.shared_state.get_page_token(target_page_id)
+        from tinydb import TinyDB, Query
+        db = TinyDB('db.json')
+        q = Query()
+        store_record = db.get(
+            q.page_id == target_page_id)
+        if store_record:
+            return store_record["page_long_lived_token"]
+        return None
+
+    def _store_cached_page_token(self, target_page_id: str, page_long_lived_token: str):
+        if self.shared_state is not None:
+            self.shared_state.set_page_token(
+                target_page_id, page_long_lived_token)
+            return
+        from tinydb import TinyDB
+        db = TinyDB('db.json')
+        db.insert({'page_id': target_page_id,
+                  'page_long_lived_token': page_long_lived_token})
+
     def get_page_long_lived_token(self, target_page_id: str):
 
         if target_page_id is None or target_page_id == "":
@@ -469,13 +644,9 @@ class FBPageInsight(BaseSettings):
         elif page_token is not None:
             return page_token
 
-        # check cached tinyDB
-        db = TinyDB('db.json')
-        q = Query()
-        store_record = db.get(
-            q.page_id == target_page_id)
-        if store_record:
-            page_long_lived_token = store_record["page_long_lived_token"]
+        # check cached tinyDB, or the shared state used by other processes
+        page_long_lived_token = self._load_cached_page_token(target_page_id)
+        if page_long_lived_token:
             self.fb_page_access_token_dict[target_page_id] = page_long_lived_token
             return page_long_lived_token
 
@@ -529,8 +700,7 @@ class FBPageInsight(BaseSettings):
                         target_page_id, no_expire_user_token)
 
         if no_expire_page_token:
-            db.insert({'page_id': target_page_id,
-                      'page_long_lived_token': no_expire_page_token})
+            self._store_cached_page_token(target_page_id, no_expire_page_token)
         else:
             raise ValueError("no available valid user/page token")
 
@@ -539,8 +709,7 @@ class FBPageInsight(BaseSettings):
 
     def debug_token(self, token: str):
         url = f'{self.api_url}/debug_token?access_token={token}&input_token={token}'
-        r = requests.get(url)
-        json_dict = r.json()
+        json_dict = self._get_cached_json("debug_token", f'{self.api_url}/debug_token:{token}', url)
         resp = DebugResponse(**json_dict)
         return resp
 
@@ -548,8 +717,7 @@ class FBPageInsight(BaseSettings):
 
     def get_page_token_from_user_token(self, target_page_id: str, user_token: str):
         url = f'{self.api_url}/me/accounts?access_token={user_token}'
-        r = requests.get(url)
-        json_dict = r.json()
+        json_dict = self._get_json(url)
         resp = AccountResponse(**json_dict)
         if resp.error is not None:
             raise ValueError(
@@ -575,8 +743,9 @@ class FBPageInsight(BaseSettings):
             url = f'{self.api_url}/{object_id}/{endpoint}?access_token={page_token}{params}'
         elif page_id:
             url = f'{self.api_url}/{page_id}/{endpoint}?access_token={page_token}{params}'
-        r = requests.get(url)
-        json_dict = r.json()
+        # page token is not a part of the key, responses are the same for any valid token
+        key = f'{self.api_url}/{object_id or page_id}/{endpoint}?{params}'
+        json_dict = self._get_cached_json(endpoint, key, url, page_id)
         return json_dict
 
     def _convert_para_dict(self, param_dict: Dict[str, str]):
@@ -615,48 +784,99 @@ class FBPageInsight(BaseSettings):
             user_defined_metric_list = [e for e in PageMetric]
         metric_value = self._convert_metric_list(user_defined_metric_list)
 
+        param_dict = {"metric": metric_value,
+                      "date_preset": date_preset.name, 'period': period.name}
         if since is not None and until is not None:
             self._check_since_less_than_until(since, until)
-            json_dict = self.compose_fb_graph_api_page_request(
-                page_id, "insights", {"metric": metric_value, "date_preset": date_preset.name, 'period': period.name, "since": since, "until": until})
-        else:
-            json_dict = self.compose_fb_graph_api_page_request(
-                page_id, "insights", {"metric": metric_value, "date_preset": date_preset.name, 'period': period.name})
+            param_dict.update({"since": since, "until": until})
+        if self.lean_mode:
+            param_dict["fields"] = LEAN_INSIGHT_FIELDS
+        json_dict = self.compose_fb_graph_api_page_request(
+            page_id, "insights", param_dict)
 
-        resp = InsightsResponse(**json_dict)
-        return resp
+        return self._parse_insights_response(json_dict)
+
+    def _parse_insights_response(self, json_dict: Dict[str, Any]) -> Union[InsightsResponse, LeanInsightsResponse]:
+        if self.lean_mode:
+            return LeanInsightsResponse(**json_dict)
+        return InsightsResponse(**json_dict)
 
     # TODO: handle until is smaller than since
-    def get_posts(self, page_id: str = None, since: int = None, until: int = None):
+    def get_posts(self, page_id: str = None, since: int = None, until: int = None, shard_days: int = None, max_workers: int = 4):
+        """ if shard_days and since/until are given, [since, until] is split into shard_days time shards which are
+            paginated concurrently by max_workers threads, and the posts are merged by post id, newest first as the api returns.
+            if fb returns an error (e.g. rate limit), the posts of the previous pages are returned with the error,
+            in shard mode a ValueError with fb's message is raised after all shards finish """
         # could use page_token or user_access_token
         page_id = self._page_id(page_id)
         # page_token = self.get_page_long_lived_token(page_id)
 
+        if shard_days is not None and since is not None and until is not None:
+            return self._get_posts_by_shards(page_id, since, until, shard_days, max_workers)
+
         # get_all = False
         next_url = ""
         post_data_list: List[PostData] = []
         while next_url is not None:
             if next_url == "":
+                # the next url keeps these params
+                param_dict = {}
                 if since is not None and until is not None:
                     self._check_since_less_than_until(since, until)
-                    json_dict = self.compose_fb_graph_api_page_request(
-                        # {"since": 1601555261, "until": 1625489082})
-                        page_id, "posts", {"since": since, "until": until})
-                else:
-                    json_dict = self.compose_fb_graph_api_page_request(
-                        page_id, "posts")
+                    # {"since": 1601555261, "until": 1625489082})
+                    param_dict.update({"since": since, "until": until})
+                json_dict = self.compose_fb_graph_api_page_request(
+                    page_id, "posts", param_dict)
                 resp = PostsResponse(**json_dict)
             else:
-                r = requests.get(next_url)
-                json_dict = r.json()
+                json_dict = self._get_json(next_url, page_id)
                 resp = PostsResponse(**json_dict)
-            next_url = resp.paging.next
+            if resp.error is not None:
+                break
+            # an empty time range might have no paging
+            next_url = resp.paging.next if resp.paging is not None else None
             post_data_list += resp.data
         for post in post_data_list:
             post.page_id = page_id
-        total_resp = PostsResponse(data=post_data_list, paging=resp.paging)
+        total_resp = PostsResponse(
+            data=post_data_list, paging=resp.paging, error=resp.error)
         return total_resp
 
+    def _get_posts_by_shards(self, page_id: str, since: int, until: int, shard_days: int, max_workers: int):
+        self._check_since_less_than_until(since, until)
+        if shard_days < 1:
+            raise ValueError("shard_days should be at least 1")
+        shard_seconds = shard_days * 86400
+        shard_list: List[Tuple[int, int]] = []
+        shard_since = since
+        while shard_since < until:
+            shard_until = min(shard_since + shard_seconds, until)
+            shard_list.append((shard_since, shard_until))
+            shard_since = shard_until
+        if len(shard_list) == 0:
+            # since == until
+            shard_list.append((since, until))
+
+        # get the page token before starting threads, token cache (db.json) is not safe for concurrent writes
+        self.get_page_long_lived_token(page_id)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            resp_list = list(executor.map(
+                lambda shard: self.get_posts(page_id, shard[0], shard[1]), shard_list))
+
+        error_resp_list = [resp for resp in resp_list if resp.error is not None]
+        if error_resp_list:
+            raise ValueError(
+                f"fail to get posts of {len(error_resp_list)}/{len(shard_list)} shards:{error_resp_list[0].error.message}")
+
+        # a post on a shard boundary might be returned by both shards
+        post_dict: Dict[str, PostData] = {}
+        for resp in resp_list:
+            for post in resp.data:
+                post_dict[post.id] = post
+        post_data_list = sorted(post_dict.values(),
+                                key=lambda post: post.created_time, reverse=True)
+        return PostsResponse(data=post_data_list)
+
     def get_post_insight(self, post_id: str, basic_metric=True, complement_metric=True, user_defined_metric_list: List[PageMetric] = []):
 
         if len(user_defined_metric_list) == 0:
@@ -673,13 +893,15 @@ class FBPageInsight(BaseSettings):
         page_id = post_id.split('_')[0]
         # page_token = self.get_page_long_lived_token(page_id)
 
+        param_dict = {"metric": metric_value}
+        if self.lean_mode:
+            param_dict["fields"] = LEAN_INSIGHT_FIELDS
         json_dict = self.compose_fb_graph_api_page_request(
-            page_id, "insights", {"metric": metric_value}, object_id=post_id)
+            page_id, "insights", param_dict, object_id=post_id)
         # NOTE: somehow FB will return invalid api result
         # if json_dict.get("data") is None:
         #     print("not ok") for debugging,
-        resp = InsightsResponse(**json_dict)
-        return resp
+        return self._parse_insights_response(json_dict)
 
     def get_page_default_web_insight(self, page_id: str = None, since_date: Tuple[str, str, str] = None, until_date: Tuple[str, str, str] = None,
                                      date_preset: DatePreset = DatePreset.yesterday,
@@ -715,7 +937,8 @@ class FBPageInsight(BaseSettings):
             return resp.dict()
         return resp
 
-    def get_post_default_web_insight(self, page_id: str = None, since_date: Tuple[str, str, str] = None, until_date: Tuple[str, str, str] = None,  between_days: int = None,  return_as_dict=False):
+    def get_post_default_web_insight(self, page_id: str = None, since_date: Tuple[str, str, str] = None, until_date: Tuple[str, str, str] = None,  between_days: int = None,  return_as_dict=False,
+                                     request_budget: int = None, priority_key=newest_created_time_first):
         """
             since_date and until_date are the tuple form of (2020, 9, 7)
             if any of since_date and until_date is omitting, between_days will be used to decide either since_date or until_date and default value is 365. 
@@ -723,6 +946,8 @@ class FBPageInsight(BaseSettings):
             if since_date is omitting, since_date = until_date - between_days  
             if since_date is not omitting but until_date is omitting, then until_date = since_date + between_days
             since_date, until_date, period_days can not be all specified as non None at the same time, will throw a error 
+            request_budget is the max number of post insight requests, posts are queried in priority_key order (newest created_time first by default)
+            and the ones not queried (out of budget or fb rate limit error) are returned in deferred_post_list
         """
 
         if since_date is not None and until_date is not None and between_days is not None:
@@ -767,20 +992,31 @@ class FBPageInsight(BaseSettings):
         since = int(since_time.timestamp())
 
         recent_posts = self.get_posts(page_id, since, until)
+        if recent_posts.error is not None:
+            raise ValueError(
+                f"fail to get posts:{recent_posts.error.message}")
         posts_data = recent_posts.data
 
+        schedule = PostInsightScheduler(
+            request_budget, priority_key).schedule(posts_data)
+
         post_composite_list: List[PostCompositeData] = []
         # iterate each post
-        for post in posts_data:
-            composite_data = PostCompositeData(meta=post)
-            composite_data.insight_data = []
-            composite_data.insight_data_complement = []
-            post_composite_list.append(composite_data)
+        for i, post in enumerate(schedule.scheduled):
             post_id = post.id
             post_insight = self.get_post_insight(post_id)
             if post_insight.error is not None:
+                if post_insight.error.code in THROTTLE_ERROR_CODES:
+                    print(
+                        f"rate limit reached:{post_insight.error.message}, defer the remaining posts")
+                    schedule.defer_remaining(i)
+                    break
                 raise ValueError(
                     f"post insight error:P{post_insight.error.message}")
+            composite_data = PostCompositeData(meta=post)
+            composite_data.insight_data = []
+            composite_data.insight_data_complement = []
+            post_composite_list.append(composite_data)
             post_insight_data = post_insight.data
             for post_insight in post_insight_data:
                 if post_insight.name in PostMetric.__members__:
@@ -795,12 +1031,40 @@ class FBPageInsight(BaseSettings):
         # organize to the data structure shown on web
         resp = self._organize_to_web_posts_data_shape(
             post_composite_list, query_time)
+        resp.deferred_post_list = schedule.deferred
+        if len(schedule.deferred) > 0:
+            print(f"{len(schedule.deferred)} posts deferred")
         # resp.query_time = query_time
         if return_as_dict == True:
             return resp.dict()
         return resp
 
-    def _organize_to_web_page_data_shape(self, page_data: List[InsightData], page_id: str):
+    def get_page_default_web_insight_delta(self, page_id: str = None, since_date: Tuple[str, str, str] = None, until_date: Tuple[str, str, str] = None,
+                                           date_preset: DatePreset = DatePreset.yesterday,
+                                           period: Literal[Period.day, Period.week, Period.days_28, Period.month] = Period.week,
+                                           differ=None, commit=True):
+        """ same as get_page_default_web_insight but only return the rows changed since the last call,
+            differ is a SnapshotDiffer, default one uses shared_state (or the default sqlite file if it is not configured) """
+        page_id = self._page_id(page_id)
+        data = self.get_page_default_web_insight(
+            page_id, since_date, until_date, date_preset, period)
+        return (differ or self._default_snapshot_differ()).diff_page(page_id, data, commit)
+
+    def get_post_default_web_insight_delta(self, page_id: str = None, since_date: Tuple[str, str, str] = None, until_date: Tuple[str, str, str] = None,  between_days: int = None,
+                                           differ=None, commit=True, request_budget: int = None, priority_key=newest_created_time_first):
+        """ same as get_post_default_web_insight but only return the posts whose metrics changed since the last call,
+            deferred posts are returned in deferred_post_list and not compared.
+            differ is a SnapshotDiffer, default one uses shared_state (or the default sqlite file if it is not configured) """
+        page_id = self._page_id(page_id)
+        data = self.get_post_default_web_insight(
+            page_id, since_date, until_date, between_days, request_budget=request_budget, priority_key=priority_key)
+        return (differ or self._default_snapshot_differ()).diff_posts(page_id, data, commit)
+
+    def _default_snapshot_differ(self):
+        from .snapshot_diff import SnapshotDiffer, SnapshotStore
+        return SnapshotDiffer(SnapshotStore(self.shared_state))
+
+    def _organize_to_web_page_data_shape(self, page_data: List[Union[InsightData, LeanInsightData]], page_id: str):
         """ currently it only support one period, it querying with on specific period in low level api,
             will return multiple periods """
 
@@ -851,8 +1115,8 @@ class FBPageInsight(BaseSettings):
         pageInsightData = PageWebInsightData()
         pageInsightData.insight_list = list(insight_dict.values())
         # pageInsightData.used_metric_desc_dict = desc_dict
-        pageInsightData.insight_json_schema = PartialJSONSchema(
-            **PageDefaultWebInsight.schema())
+        pageInsightData.insight_json_schema = _partial_json_schema(
+            PageDefaultWebInsight)
         return pageInsightData
 
     def _organize_to_web_posts_data_shape(self, posts_data: List[PostCompositeData], query_time: datetime):
@@ -935,10 +1199,9 @@ class FBPageInsight(BaseSettings):
                     #   0
                     # post_reactions_haha_total
                     #   0
-        postsWebInsight.insight_json_schema = PartialJSONSchema(
-            **PostDefaultWebInsight.schema())
-        postsWebInsight.post_json_schema = PartialJSONSchema(
-            **PostData.schema())
+        postsWebInsight.insight_json_schema = _partial_json_schema(
+            PostDefaultWebInsight)
+        postsWebInsight.post_json_schema = _partial_json_schema(PostData)
 
         # postsWebInsight.used_metric_desc_dict = desc_dict
         return postsWebInsight
@@ -0,0 +1,155 @@
+import math
+import time
+from datetime import datetime
+from enum import IntEnum
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+from .fb_page_insight import FBPageInsight, Period
+from .export import ExportKind, ExportUnit, Exporter
+
+
+class PlannerConst(IntEnum):
+    # fb returns at most 25 posts per page of /posts by default
+    posts_page_size = 25
+    # get_page_long_lived_token of each page, at most: debug_token + long-lived exchange of the page token,
+    # then debug_token + long-lived exchange of the user token and me/accounts
+    token_request_count_per_page = 5
+
+
+class PlannedUnit(BaseModel):
+    unit: ExportUnit
+    post_count: Optional[int]  # None for page units
+    estimated_request_count: int
+
+
+# run_plan starts each shard one hour after the previous run shard, so finished shards do not wait
+class PlannedShard(BaseModel):
+    index: int
+    planned_unit_list: List[PlannedUnit]
+    estimated_request_count: int
+
+
+class BackfillPlan(BaseModel):
+    hourly_request_budget: int
+    # True: post counts are estimated by posts_per_day, no api call
+    dry_run: bool
+    token_request_count: int
+    estimated_request_count: int
+    estimated_hours: int
+    shard_list: List[PlannedShard]
+    # export settings used by run_plan, defaults are the same as the export command
+    period: str = Period.week.name
+    out_dir: str = 'fb_insights_export'
+    # None: OUT_DIR/journal.jsonl
+    journal: Optional[str] = None
+    concurrency: int = 1
+
+    def save(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.json(indent=2))
+
+    @classmethod
+    def load(cls, path: str):
+        return cls.parse_file(path)
+
+    def summary(self):
+        return (f"{len(self.shard_list)} shards, {self.estimated_request_count} requests "
+                f"({self.token_request_count} for tokens), about {self.estimated_hours} hours "
+                f"with {self.hourly_request_budget} requests/hour")
+
+
+class BackfillPlanner:
+    """ estimate the request count of export units and split them into shards sized to the hourly budget
+
+        dry_run: post count = posts_per_day * days, no api call.
+        otherwise post count comes from get_posts, which costs its pagination requests
+    """
+
+    def __init__(self, fb: FBPageInsight = None, hourly_request_budget: int = 200, posts_per_day: float = 1.0):
+        if hourly_request_budget < 1:
+            raise ValueError("hourly_request_budget should be at least 1")
+        self.fb = fb
+        self.hourly_request_budget = hourly_request_budget
+        self.posts_per_day = posts_per_day
+
+    def _count_posts(self, unit: ExportUnit, dry_run: bool) -> int:
+        days = (unit.until_date - unit.since_date).days
+        if dry_run:
+            return math.ceil(days * self.posts_per_day)
+        if self.fb is None:
+            raise ValueError("fb should be assigned when dry_run is False")
+        since = int(datetime(unit.since_date.year,
+                    unit.since_date.month, unit.since_date.day).timestamp())
+        until = int(datetime(unit.until_date.year,
+                    unit.until_date.month, unit.until_date.day).timestamp())
+        posts = self.fb.get_posts(unit.page_id, since, until)
+        if posts.error is not None:
+            raise ValueError(f"fail to get posts:{posts.error.message}")
+        return len(posts.data)
+
+    def estimate_unit(self, unit: ExportUnit, dry_run: bool = True) -> PlannedUnit:
+        if unit.kind == ExportKind.page:
+            # build_export_units keeps page units within one page insights request
+            return PlannedUnit(unit=unit, estimated_request_count=1)
+        post_count = self._count_posts(unit, dry_run)
+        # get_posts pagination + one get_post_insight per post
+        request_count = max(1, math.ceil(
+            post_count / PlannerConst.posts_page_size)) + post_count
+        return PlannedUnit(unit=unit, post_count=post_count, estimated_request_count=request_count)
+
+    def plan(self, unit_list: List[ExportUnit], dry_run: bool = True) -> BackfillPlan:
+        planned_unit_list = [self.estimate_unit(
+            unit, dry_run) for unit in unit_list]
+        token_request_count = PlannerConst.token_request_count_per_page * \
+            len({unit.page_id for unit in unit_list})
+
+        shard_list: List[PlannedShard] = []
+        # tokens are fetched before the first shard, so count them in
+        shard_request_count = token_request_count
+        shard_unit_list: List[PlannedUnit] = []
+        for planned_unit in planned_unit_list:
+            if shard_unit_list and shard_request_count + planned_unit.estimated_request_count > self.hourly_request_budget:
+                shard_list.append(PlannedShard(index=len(shard_list), planned_unit_list=shard_unit_list,
+                                               estimated_request_count=shard_request_count))
+                shard_request_count = 0
+                shard_unit_list = []
+            # a unit more than the budget is still put in its own shard, shared rate limit waits for it
+            shard_unit_list.append(planned_unit)
+            shard_request_count += planned_unit.estimated_request_count
+        if shard_unit_list:
+            shard_list.append(PlannedShard(index=len(shard_list), planned_unit_list=shard_unit_list,
+                                           estimated_request_count=shard_request_count))
+
+        estimated_request_count = token_request_count + \
+            sum(e.estimated_request_count for e in planned_unit_list)
+        return BackfillPlan(hourly_request_budget=self.hourly_request_budget, dry_run=dry_run,
+                            token_request_count=token_request_count,
+                            estimated_request_count=estimated_request_count,
+                            # shards are not fully packed, so it might be more than request count / budget
+                            estimated_hours=len(shard_list),
+                            shard_list=shard_list)
+
+
+def run_plan(plan: BackfillPlan, exporter: Exporter, wait_between_shards=True) -> Dict[int, int]:
+    """ export shard by shard and wait one hour between shards. units in exporter's journal are skipped,
+        so an interrupted plan can be run again. return the failed unit count of each run shard """
+    failed_count_dict: Dict[int, int] = {}
+    last_shard_start: float = None
+    for shard in plan.shard_list:
+        unit_list = [e.unit for e in shard.planned_unit_list]
+        if all(exporter.is_done(unit) for unit in unit_list):
+            continue
+        if wait_between_shards and last_shard_start is not None:
+            wait = last_shard_start + 3600 - time.time()
+            if wait > 0:
+                print(
+                    f"wait {wait:.0f}s for the next hourly budget, shard {shard.index}")
+                time.sleep(wait)
+        last_shard_start = time.time()
+        print(
+            f"run shard {shard.index}/{len(plan.shard_list)}, about {shard.estimated_request_count} requests")
+        stats = exporter.run(unit_list)
+        failed_count_dict[shard.index] = stats.failed
+    return failed_count_dict
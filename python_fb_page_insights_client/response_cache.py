@@ -0,0 +1,189 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+# seconds, debug_token result is stable within a run, insights/posts change slowly
+DEFAULT_ENDPOINT_TTL: Dict[str, float] = {
+    'debug_token': 3600,
+    'insights': 600,
+    'posts': 600,
+}
+
+
+class _InFlight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class ResponseCache:
+    """ TTL + LRU cache of graph api json responses, keyed by the request without access token
+
+        - endpoint_ttl: seconds per endpoint (e.g. insights/posts/debug_token), 0 means not cached,
+          endpoints not listed use default_ttl
+        - max_entries: in-memory entries, the least recently used one is evicted first
+        - disk_path: optional sqlite file, so another run can reuse the unexpired responses
+        - concurrent requests with the same key are coalesced into one upstream request
+        error responses are never cached
+    """
+
+    def __init__(self, max_entries: int = 1024, default_ttl: float = 300,
+                 endpoint_ttl: Dict[str, float] = None, disk_path: str = None):
+        if max_entries < 1:
+            raise ValueError("max_entries should be at least 1")
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.endpoint_ttl = dict(DEFAULT_ENDPOINT_TTL)
+        if endpoint_ttl is not None:
+            self.endpoint_ttl.update(endpoint_ttl)
+        self.disk_path = disk_path
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+        # key -> (expires_at, json_dict)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._in_flight: Dict[str, _InFlight] = {}
+        self._lock = threading.Lock()
+        if disk_path:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS response (key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value TEXT NOT NULL)')
+            finally:
+                conn.close()
+
+    def ttl(self, endpoint: str) -> float:
+        return self.endpoint_ttl.get(endpoint, self.default_ttl)
+
+    def _connect(self):
+        return sqlite3.connect(self.disk_path, timeout=30, isolation_level=None)
+
+    @staticmethod
+    def _disk_key(key: str):
+        # key might include a token (e.g. debug_token), do not store it in plain text
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def _get_memory(self, key: str, now: float):
+        ''' call it with self._lock held '''
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def _put_memory(self, key: str, expires_at: float, value: dict):
+        ''' call it with self._lock held '''
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # disk I/O runs without self._lock, sqlite handles its own locking,
+    # so lookups of other keys are not blocked by it
+
+    def _get_disk(self, key: str, now: float):
+        if not self.disk_path:
+            return None
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT expires_at, value FROM response WHERE key = ?',
+                               (self._disk_key(key),)).fetchone()
+        finally:
+            conn.close()
+        if row is None or row[0] <= now:
+            return None
+        return row[0], json.loads(row[1])
+
+    def _put_disk(self, key: str, expires_at: float, value: dict):
+        if not self.disk_path:
+            return
+        conn = self._connect()
+        try:
+            conn.execute('INSERT OR REPLACE INTO response (key, expires_at, value) VALUES (?, ?, ?)',
+                         (self._disk_key(key), expires_at, json.dumps(value)))
+            conn.execute('DELETE FROM response WHERE expires_at <= ?',
+                         (time.time(),))
+        finally:
+            conn.close()
+
+    def get_or_fetch(self, endpoint: str, key: str, fetch: Callable[[], dict]) -> dict:
+        """ return the cached json dict of key, or call fetch once even if several threads ask for key at the same time.
+            the returned dict is shared, do not modify it """
+        ttl = self.ttl(endpoint)
+        if ttl <= 0:
+            return fetch()
+
+        with self._lock:
+            value = self._get_memory(key, time.time())
+            if value is not None:
+                self.hits += 1
+                return value
+            in_flight = self._in_flight.get(key)
+            is_owner = in_flight is None
+            if is_owner:
+                in_flight = _InFlight()
+                self._in_flight[key] = in_flight
+            else:
+                self.coalesced += 1
+
+        if not is_owner:
+            in_flight.event.wait()
+            if in_flight.error is not None:
+                raise in_flight.error
+            return in_flight.value
+
+        # only the owner of the key reads the disk, waiters of the same key are coalesced
+        expires_at = None
+        try:
+            disk_entry = self._get_disk(key, time.time())
+            if disk_entry is not None:
+                expires_at, value = disk_entry
+                is_fetched = False
+            else:
+                value = fetch()
+                is_fetched = True
+                if isinstance(value, dict) and value.get("error") is None:
+                    expires_at = time.time() + ttl
+            in_flight.value = value
+        except BaseException as e:
+            in_flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if in_flight.error is None:
+                    if is_fetched:
+                        self.misses += 1
+                    else:
+                        self.hits += 1
+                    if expires_at is not None:
+                        self._put_memory(key, expires_at, value)
+                del self._in_flight[key]
+            in_flight.event.set()
+
+        if is_fetched and expires_at is not None:
+            try:
+                self._put_disk(key, expires_at, value)
+            except sqlite3.Error as e:
+                # the response is still good even if it can not be cached
+                print(f"fail to write response cache:{e}")
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.disk_path:
+            conn = self._connect()
+            try:
+                conn.execute('DELETE FROM response')
+            finally:
+                conn.close()
@@ -0,0 +1,49 @@
+from typing import Any, Callable, List, Optional
+
+
+def newest_created_time_first(post) -> Any:
+    ''' default priority: PostData.created_time is an isoformat string after its validator,
+        so string order is time order and the newest post gets the highest priority '''
+    return post.created_time
+
+
+class PostInsightSchedule:
+    def __init__(self, scheduled: List, deferred: List):
+        # posts to query, in priority order
+        self.scheduled = scheduled
+        # posts which do not fit into the request budget, in priority order
+        self.deferred = deferred
+
+    def defer_remaining(self, index: int):
+        ''' e.g. fb returns a rate limit error when querying scheduled[index],
+            move it and all the posts after it to deferred '''
+        self.deferred = self.scheduled[index:] + self.deferred
+        self.scheduled = self.scheduled[:index]
+
+
+class PostInsightScheduler:
+    """ order post insight requests by priority and cut them at the request budget
+
+        priority_key: post -> comparable value, higher value is queried first.
+        request_budget: max number of post insight requests, None means no limit
+        requests_per_post: how many requests one post costs, get_post_insight uses 1
+    """
+
+    def __init__(self, request_budget: Optional[int] = None,
+                 priority_key: Callable[[Any], Any] = newest_created_time_first,
+                 requests_per_post: int = 1):
+        if request_budget is not None and request_budget < 0:
+            raise ValueError("request_budget should not be negative")
+        if requests_per_post < 1:
+            raise ValueError("requests_per_post should be at least 1")
+        self.request_budget = request_budget
+        self.priority_key = priority_key
+        self.requests_per_post = requests_per_post
+
+    def schedule(self, posts: List) -> PostInsightSchedule:
+        # sorted is stable, so posts with the same priority keep the api order
+        ordered = sorted(posts, key=self.priority_key, reverse=True)
+        if self.request_budget is None:
+            return PostInsightSchedule(ordered, [])
+        max_posts = self.request_budget // self.requests_per_post
+        return PostInsightSchedule(ordered[:max_posts], ordered[max_posts:])
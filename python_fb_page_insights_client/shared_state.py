@@ -0,0 +1,151 @@
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+
+class SharedState:
+    """ state shared by all FBPageInsight instances/processes on the same host, stored in a local sqlite file
+
+        - page token cache (replace db.json which has no lock)
+        - usage counters, number of requests per key in the current hour
+        - token bucket, a global request budget
+        - snapshot fingerprints, hash of each last emitted row of the *_delta methods
+        every write runs in a `BEGIN IMMEDIATE` transaction which holds the sqlite file write lock,
+        so concurrent processes are serialized
+    """
+
+    def __init__(self, path: str = 'fb_shared_state.sqlite3', timeout: float = 30.0):
+        self.path = path
+        # how long to wait for the file lock held by another process
+        self.timeout = timeout
+        self._initialized = False
+
+    def _connect(self):
+        # autocommit mode, transactions are managed explicitly
+        conn = sqlite3.connect(
+            self.path, timeout=self.timeout, isolation_level=None)
+        if not self._initialized:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS page_token (page_id TEXT PRIMARY KEY, token TEXT NOT NULL)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS usage (key TEXT NOT NULL, hour INTEGER NOT NULL, count INTEGER NOT NULL, PRIMARY KEY (key, hour))')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS bucket (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS snapshot_fingerprint (kind TEXT NOT NULL, page_id TEXT NOT NULL, key TEXT NOT NULL, fingerprint TEXT NOT NULL, PRIMARY KEY (kind, page_id, key))')
+            self._initialized = True
+        return conn
+
+    @contextmanager
+    def _write_transaction(self):
+        ''' with self._write_transaction() as conn: ..., committed if no exception is raised '''
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            yield conn
+            conn.execute('COMMIT')
+        except BaseException:
+            # BEGIN IMMEDIATE itself might fail, e.g. database is locked, then there is nothing to roll back
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def get_page_token(self, page_id: str) -> Optional[str]:
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                'SELECT token FROM page_token WHERE page_id = ?', (page_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return row[0]
+
+    def set_page_token(self, page_id: str, token: str):
+        conn = self._connect()
+        try:
+            conn.execute(
+                'INSERT OR REPLACE INTO page_token (page_id, token) VALUES (?, ?)', (page_id, token))
+        finally:
+            conn.close()
+
+    def get_fingerprints(self, kind: str, page_id: str) -> Dict[str, str]:
+        conn = self._connect()
+        try:
+            row_list = conn.execute('SELECT key, fingerprint FROM snapshot_fingerprint WHERE kind = ? AND page_id = ?',
+                                    (kind, page_id)).fetchall()
+        finally:
+            conn.close()
+        return dict(row_list)
+
+    def set_fingerprints(self, kind: str, page_id: str, fingerprint_dict: Dict[str, str]):
+        ''' upsert the given rows only, other rows of the page are kept '''
+        with self._write_transaction() as conn:
+            conn.executemany('INSERT OR REPLACE INTO snapshot_fingerprint (kind, page_id, key, fingerprint) VALUES (?, ?, ?, ?)',
+                             [(kind, page_id, key, value) for key, value in fingerprint_dict.items()])
+
+    @staticmethod
+    def _current_hour():
+        return int(time.time() // 3600)
+
+    def add_usage(self, key: str, count: int = 1):
+        hour = self._current_hour()
+        with self._write_transaction() as conn:
+            conn.execute(
+                'INSERT OR IGNORE INTO usage (key, hour, count) VALUES (?, ?, 0)', (key, hour))
+            conn.execute(
+                'UPDATE usage SET count = count + ? WHERE key = ? AND hour = ?', (count, key, hour))
+            # only keep the current hour
+            conn.execute('DELETE FROM usage WHERE hour < ?', (hour,))
+
+    def get_usage(self, key: str) -> int:
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT count FROM usage WHERE key = ? AND hour = ?',
+                               (key, self._current_hour())).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return 0
+        return row[0]
+
+    def try_acquire(self, name: str, capacity: float, refill_per_second: float, n: float = 1) -> float:
+        """ take n tokens from the bucket. return 0 if acquired,
+            otherwise the seconds to wait until n tokens are available """
+        if n > capacity:
+            raise ValueError("n should not be more than bucket capacity")
+        now = time.time()
+        with self._write_transaction() as conn:
+            row = conn.execute(
+                'SELECT tokens, updated_at FROM bucket WHERE name = ?', (name,)).fetchone()
+            if row is None:
+                tokens = capacity
+            else:
+                tokens = min(capacity, row[0] +
+                             max(0.0, now - row[1]) * refill_per_second)
+            if tokens >= n:
+                tokens -= n
+                wait = 0.0
+            else:
+                wait = (n - tokens) / refill_per_second
+            conn.execute('INSERT OR REPLACE INTO bucket (name, tokens, updated_at) VALUES (?, ?, ?)',
+                         (name, tokens, now))
+        return wait
+
+    def acquire(self, name: str, capacity: float, refill_per_second: float, n: float = 1, timeout: float = None) -> bool:
+        """ block until n tokens are taken from the bucket. return False if timeout (seconds) is reached first """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            wait = self.try_acquire(name, capacity, refill_per_second, n)
+            if wait == 0:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            # other processes might take the refilled tokens first, so check again after waking up
+            time.sleep(wait)
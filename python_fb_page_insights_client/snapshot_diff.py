@@ -0,0 +1,96 @@
+import hashlib
+import json
+from typing import Dict, List
+
+from pydantic import BaseModel
+
+from .fb_page_insight import (PageDefaultWebInsight, PageWebInsightData, PostData,
+                              PostDefaultWebInsight, PostsWebInsightData)
+from .shared_state import SharedState
+
+
+class PostsWebInsightDelta(BaseModel):
+    page_id: str
+    # rows never emitted before
+    insert_list: List[PostDefaultWebInsight] = []
+    # rows whose metrics changed since they were last emitted
+    update_list: List[PostDefaultWebInsight] = []
+    unchanged_count: int = 0
+    # meta of inserted/updated posts
+    post_list: List[PostData] = []
+    # posts not queried because of request budget or fb rate limit, they are not compared
+    deferred_post_list: List[PostData] = []
+
+
+class PageWebInsightDelta(BaseModel):
+    page_id: str
+    insert_list: List[PageDefaultWebInsight] = []
+    update_list: List[PageDefaultWebInsight] = []
+    unchanged_count: int = 0
+
+
+def fingerprint(insight: BaseModel, exclude: set = None) -> str:
+    ''' 8 bytes hash of the row values '''
+    row = json.dumps(insight.dict(exclude=exclude),
+                     sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(row.encode('utf-8'), digest_size=8).hexdigest()
+
+
+class SnapshotStore:
+    """ fingerprint of each last emitted row per page, kept in the sqlite file of SharedState,
+        so processes sharing it see the same snapshot. one row per emitted row, only changed ones are written """
+
+    def __init__(self, shared_state: SharedState = None):
+        self.shared_state = shared_state or SharedState()
+
+    def load(self, kind: str, page_id: str) -> Dict[str, str]:
+        return self.shared_state.get_fingerprints(kind, page_id)
+
+    def save(self, kind: str, page_id: str, fingerprint_dict: Dict[str, str]):
+        ''' upsert the given fingerprints, others of the page are kept '''
+        self.shared_state.set_fingerprints(kind, page_id, fingerprint_dict)
+
+
+class SnapshotDiffer:
+    """ compare a snapshot with the last emitted one of the same page.
+        commit=True remembers the new fingerprints, rows not in the snapshot (e.g. another time range) are kept """
+
+    def __init__(self, store: SnapshotStore = None):
+        self.store = store or SnapshotStore()
+
+    def _diff(self, kind: str, page_id: str, keyed_row_list, exclude: set, commit: bool):
+        fingerprint_dict = self.store.load(kind, page_id)
+        changed_fingerprint_dict = {}
+        insert_list = []
+        update_list = []
+        unchanged_count = 0
+        for key, row in keyed_row_list:
+            new_fingerprint = fingerprint(row, exclude)
+            old_fingerprint = fingerprint_dict.get(key)
+            if old_fingerprint is None:
+                insert_list.append(row)
+            elif old_fingerprint != new_fingerprint:
+                update_list.append(row)
+            else:
+                unchanged_count += 1
+                continue
+            changed_fingerprint_dict[key] = new_fingerprint
+        if commit and changed_fingerprint_dict:
+            self.store.save(kind, page_id, changed_fingerprint_dict)
+        return insert_list, update_list, unchanged_count
+
+    def diff_posts(self, page_id: str, data: PostsWebInsightData, commit=True) -> PostsWebInsightDelta:
+        # query_time changes every run, it is not a metric
+        insert_list, update_list, unchanged_count = self._diff(
+            'post', page_id, [(e.post_id, e) for e in data.insight_list], {'query_time'}, commit)
+        changed_id_set = {e.post_id for e in insert_list + update_list}
+        return PostsWebInsightDelta(page_id=page_id, insert_list=insert_list, update_list=update_list,
+                                    unchanged_count=unchanged_count,
+                                    post_list=[e for e in data.post_list if e.id in changed_id_set],
+                                    deferred_post_list=data.deferred_post_list)
+
+    def diff_page(self, page_id: str, data: PageWebInsightData, commit=True) -> PageWebInsightDelta:
+        insert_list, update_list, unchanged_count = self._diff(
+            'page', page_id, [(f'{e.period}_{e.end_time}', e) for e in data.insight_list or []], None, commit)
+        return PageWebInsightDelta(page_id=page_id, insert_list=insert_list, update_list=update_list,
+                                   unchanged_count=unchanged_count)
@@ -0,0 +1,83 @@
+from python_fb_page_insights_client.compact import CompactPageInsights, CompactPostInsights
+from python_fb_page_insights_client.fb_page_insight import PageDefaultWebInsight, PageWebInsightData, PostData, PostDefaultWebInsight, PostsWebInsightData
+import math
+import unittest
+
+try:
+    from python_fb_page_insights_client.analytics import PageInsightFrame, PostInsightFrame
+    has_numpy = True
+except ImportError:
+    has_numpy = False
+
+
+@unittest.skipUnless(has_numpy, "numpy is not installed")
+class TestAnalytics(unittest.TestCase):
+    def setUp(self):
+        self.data = PostsWebInsightData(
+            insight_list=[
+                PostDefaultWebInsight(post_id="1_a", reach=100, engagement_post_clicks=5, engagement_activity=5,
+                                      link_clicks=2, likes_like=3, likes_love=1),
+                PostDefaultWebInsight(post_id="1_b", reach=0, link_clicks=1),
+                PostDefaultWebInsight(
+                    post_id="2_c", reach=50, link_clicks=None, likes_haha=2),
+            ],
+            post_list=[PostData(id="1_a", created_time="2021-08-02T07:00:00+0000", page_id="1"),
+                       PostData(id="1_b", created_time="2021-08-08T07:00:00+0000", page_id="1"),
+                       PostData(id="2_c", created_time="2021-09-01T07:00:00+0000", page_id="2")])
+
+    def test_rates(self):
+        frame = PostInsightFrame.from_web_insight(self.data)
+        rate = frame.engagement_rate()
+        self.assertAlmostEqual(rate[0], 0.1)
+        # reach is 0
+        self.assertTrue(math.isnan(rate[1]))
+        # fb returned neither engagement metric
+        self.assertTrue(math.isnan(rate[2]))
+        ctr = frame.click_through_rate()
+        self.assertAlmostEqual(ctr[0], 0.02)
+        self.assertTrue(math.isnan(ctr[2]))
+        mix = frame.reaction_mix()
+        self.assertAlmostEqual(mix["likes_like"][0], 0.75)
+        self.assertAlmostEqual(mix["likes_haha"][2], 1)
+
+    def test_group_by(self):
+        frame = PostInsightFrame.from_web_insight(self.data)
+        self.assertEqual(frame.group_by("reach", "page"), {"1": 100, "2": 50})
+        self.assertEqual(frame.group_by("link_clicks", "page", "count"), {
+                         "1": 2, "2": 0})
+        # 2021-08-02 and 2021-08-08 are in the same week (Monday to Sunday)
+        self.assertEqual(frame.group_by("reach", "week", "max"), {
+                         "2021-08-02": 100, "2021-08-30": 50})
+        self.assertEqual(frame.group_by("reach", "month", "mean"), {
+                         "2021-08": 50, "2021-09": 50})
+
+    def test_top_n_percentiles(self):
+        frame = PostInsightFrame.from_web_insight(self.data).with_rates()
+        self.assertEqual(frame.top_n("reach", 2), ["1_a", "2_c"])
+        self.assertEqual(frame.top_n("link_clicks", 5), ["1_a", "1_b"])
+        self.assertEqual(frame.percentiles("reach", [50]), {50: 50})
+        # 2_c has no engagement metrics, it is skipped instead of ranked as 0
+        self.assertEqual(frame.top_n("engagement_rate", 5), ["1_a"])
+
+    def test_compact(self):
+        compact = CompactPostInsights.from_models(self.data.insight_list)
+        frame = PostInsightFrame.from_compact(compact, self.data.post_list)
+        self.assertEqual(frame.group_by("reach", "page"), {"1": 100, "2": 50})
+
+    def test_page(self):
+        page_data = PageWebInsightData(insight_list=[
+            PageDefaultWebInsight(
+                page_id="1", end_time="2021-08-07T07:00:00+0000", page_views=3),
+            PageDefaultWebInsight(
+                page_id="1", end_time="2021-08-14T07:00:00+0000", page_views=None),
+        ])
+        frame = PageInsightFrame.from_web_insight(page_data)
+        self.assertEqual(frame.group_by("page_views", "month"), {"2021-08": 3})
+        compact_frame = PageInsightFrame.from_compact(
+            CompactPageInsights.from_models(page_data.insight_list))
+        self.assertEqual(compact_frame.group_by(
+            "page_views", "week", "count"), {"2021-08-02": 1, "2021-08-09": 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+from python_fb_page_insights_client.compact import CompactPageInsights, CompactPostInsights, MISSING
+from python_fb_page_insights_client.fb_page_insight import PageDefaultWebInsight, PostDefaultWebInsight
+import sys
+import unittest
+
+
+class TestCompactInsights(unittest.TestCase):
+    def setUp(self):
+        self.post_insight_list = [PostDefaultWebInsight(post_id=f"1_{i}", query_time="2021-08-07T07:00:00.123456",
+                                                        reach=i * 10, likes=i, link_clicks=None)
+                                  for i in range(100)]
+
+    def test_round_trip(self):
+        compact = CompactPostInsights.from_models(self.post_insight_list)
+        self.assertEqual(len(compact), 100)
+        self.assertEqual(compact.to_models(), self.post_insight_list)
+        self.assertEqual(compact[-1], self.post_insight_list[-1])
+        self.assertEqual(compact.column("link_clicks")[0], MISSING)
+
+    def test_slice(self):
+        compact = CompactPostInsights.from_models(self.post_insight_list)
+        part = compact[10:20:2]
+        self.assertIsInstance(part, CompactPostInsights)
+        self.assertEqual(list(part), self.post_insight_list[10:20:2])
+        with self.assertRaises(IndexError):
+            part[5]
+
+    def test_page(self):
+        page_insight = PageDefaultWebInsight(
+            page_id="1", end_time="2021-08-07T07:00:00+0000", period="week", page_views=3)
+        compact = CompactPageInsights.from_models([page_insight, page_insight])
+        self.assertEqual(compact[1], page_insight)
+        # page_id is interned
+        self.assertEqual(len(compact.string_pool.string_list), 2)
+
+    def test_smaller(self):
+        compact = CompactPostInsights.from_models(self.post_insight_list)
+        model_bytes = sum(sys.getsizeof(e.__dict__) + sum(sys.getsizeof(v) for v in e.__dict__.values())
+                          for e in self.post_insight_list)
+        self.assertLess(compact.nbytes * 5, model_bytes)
+
+
+if __name__ == '__main__':
+    unittest.main()
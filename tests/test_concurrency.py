@@ -0,0 +1,80 @@
+from python_fb_page_insights_client import FBPageInsight
+from python_fb_page_insights_client.concurrency import AdaptiveConcurrencyController
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+import threading
+import time
+import unittest
+
+
+class TestAdaptiveConcurrencyController(unittest.TestCase):
+    def test_additive_increase(self):
+        controller = AdaptiveConcurrencyController(
+            initial_limit=2, max_limit=4)
+        for _ in range(100):
+            controller.acquire()
+            controller.release(0.1)
+        self.assertEqual(controller.limit, 4)
+
+    def test_multiplicative_decrease(self):
+        controller = AdaptiveConcurrencyController(initial_limit=16)
+        controller.acquire()
+        controller.release(0.1)
+        controller.acquire()
+        controller.release(0.1, throttled=True)
+        self.assertLess(controller.limit, 9)
+        # the same burst does not cut it again
+        controller.acquire()
+        controller.release(0.1, throttled=True)
+        self.assertLess(4, controller.limit)
+
+    def test_latency_spike(self):
+        controller = AdaptiveConcurrencyController(initial_limit=8)
+        for latency in [0.01, 0.01, 0.5]:
+            controller.acquire()
+            controller.release(latency)
+        self.assertLessEqual(controller.limit, 4.5)
+
+    def test_limit_in_flight(self):
+        controller = AdaptiveConcurrencyController(
+            initial_limit=2, max_limit=2)
+        lock = threading.Lock()
+        in_flight = []
+        max_in_flight = []
+
+        def work(_):
+            with controller.slot():
+                with lock:
+                    in_flight.append(1)
+                    max_in_flight.append(len(in_flight))
+                time.sleep(0.01)
+                with lock:
+                    in_flight.pop()
+
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(work, range(16)))
+        self.assertEqual(max(max_in_flight), 2)
+
+    def test_throttle_response(self):
+        controller = AdaptiveConcurrencyController(initial_limit=8)
+        fb = FBPageInsight().use_concurrency_controller(controller)
+        session = mock.Mock()
+        session.get.return_value.json.return_value = {
+            "error": {"code": 613, "message": "Calls to this api have exceeded the rate limit."}}
+        fb._session = session
+        fb._get_json("https://graph.facebook.com/v10.0/1/posts")
+        self.assertEqual(controller.throttle_count, 1)
+        self.assertEqual(controller.limit, 4)
+        self.assertEqual(controller.in_flight, 0)
+
+    def test_slot_released_on_keyboard_interrupt(self):
+        controller = AdaptiveConcurrencyController(
+            initial_limit=1, max_limit=1)
+        with self.assertRaises(KeyboardInterrupt):
+            with controller.slot():
+                raise KeyboardInterrupt
+        self.assertEqual(controller.in_flight, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
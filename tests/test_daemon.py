@@ -0,0 +1,95 @@
+from python_fb_page_insights_client.daemon import InsightSink, PollingDaemon, PollingKind, PollThrottled
+from python_fb_page_insights_client.fb_page_insight import DebugError, InsightsResponse, PostData, PostsResponse
+from unittest import mock
+import random
+import unittest
+
+
+class ListSink(InsightSink):
+    def __init__(self):
+        self.record_list = []
+
+    def write(self, kind, page_id, data):
+        self.record_list.append((kind, page_id, data))
+
+
+class TestPollingDaemon(unittest.TestCase):
+    def test_run(self):
+        fb = mock.Mock()
+        fb.get_page_insights.return_value = InsightsResponse(data=[])
+        fb.get_posts.return_value = PostsResponse(
+            data=[PostData(id="1_a", created_time="2021-08-07T07:00:00+0000")])
+        fb.get_post_insight.return_value = InsightsResponse(data=[])
+        sink = ListSink()
+        daemon = PollingDaemon(fb, ["1", "2"], sink, page_interval=0.01, post_interval=0.02,
+                               jitter=0.5, rng=random.Random(0))
+        daemon.run(max_runs=12)
+
+        self.assertEqual(daemon.run_count, 12)
+        self.assertEqual(len(sink.record_list), 12)
+        # every page and kind is polled
+        kind_page_set = {(kind, page_id)
+                         for kind, page_id, _ in sink.record_list}
+        self.assertEqual(len(kind_page_set), 4)
+        post_record = next(
+            data for kind, _, data in sink.record_list if kind == PollingKind.post_insights)
+        self.assertEqual(post_record["post_insight_list"][0]["post"]["id"], "1_a")
+
+    def test_error_does_not_stop(self):
+        fb = mock.Mock()
+        fb.get_page_insights.side_effect = ValueError("network error")
+        fb.get_posts.return_value = PostsResponse(data=[])
+        daemon = PollingDaemon(fb, ["1"], ListSink(), page_interval=0.01,
+                               post_interval=0.01, rng=random.Random(0))
+        daemon.run(max_runs=4)
+        self.assertEqual(daemon.run_count, 4)
+        self.assertGreater(daemon.error_count, 0)
+
+    def test_throttled_post_insights(self):
+        fb = mock.Mock()
+        fb.get_posts.return_value = PostsResponse(
+            data=[PostData(id=f"1_{e}", created_time="2021-08-07T07:00:00+0000") for e in "abc"])
+        fb.get_post_insight.side_effect = [InsightsResponse(data=[]), InsightsResponse(
+            data=[], error=DebugError(code=4, message="Application request limit reached"))]
+        sink = ListSink()
+        daemon = PollingDaemon(fb, ["1"], sink, rng=random.Random(0))
+        with mock.patch("builtins.print"), self.assertRaises(PollThrottled):
+            daemon.poll_post_insights("1")
+        # the fetched insight is still written
+        _, _, data = sink.record_list[0]
+        self.assertEqual([e["post"]["id"]
+                         for e in data["post_insight_list"]], ["1_a"])
+        self.assertEqual(data["deferred_post_id_list"], ["1_b", "1_c"])
+
+    def test_throttle_backoff(self):
+        fb = mock.Mock()
+        fb.get_page_insights.return_value = InsightsResponse(
+            data=[], error=DebugError(code=4, message="Application request limit reached"))
+        fb.get_posts.return_value = PostsResponse(data=[])
+        daemon = PollingDaemon(fb, ["1"], ListSink(), page_interval=0.01, post_interval=0.01,
+                               jitter=0, rng=random.Random(0), throttle_backoff=2, max_backoff=4)
+        with mock.patch("builtins.print"):
+            daemon.run(max_runs=8)
+        self.assertEqual(daemon.error_count, 0)
+        self.assertGreater(daemon.throttle_count, 0)
+        self.assertEqual(
+            daemon._backoff_dict[(PollingKind.page_insights, "1")], 4)
+        self.assertEqual(
+            daemon._backoff_dict[(PollingKind.post_insights, "1")], 1)
+
+    def test_throttled_posts(self):
+        from python_fb_page_insights_client import FBPageInsight
+        fb = FBPageInsight(fb_page_access_token_dict={"1": "token"})
+        throttle = {"error": {"code": 4, "message": "Application request limit reached"}}
+        daemon = PollingDaemon(fb, ["1"], ListSink(), rng=random.Random(0))
+        with mock.patch.object(FBPageInsight, "_get_json", return_value=throttle), \
+                self.assertRaises(PollThrottled):
+            daemon.poll_post_insights("1")
+
+    def test_sink_is_abstract(self):
+        with self.assertRaises(TypeError):
+            InsightSink()
+
+
+if __name__ == '__main__':
+    unittest.main()
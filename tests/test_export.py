@@ -0,0 +1,91 @@
+from python_fb_page_insights_client.fb_page_insight import Period
+from python_fb_page_insights_client.export import ExportJournal, ExportKind, Exporter, build_export_units, split_date_range
+from datetime import date
+from unittest import mock
+import os
+import tempfile
+import unittest
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.out_dir = self.tmp_dir.name
+        self.journal_path = os.path.join(self.out_dir, "journal.jsonl")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_split_date_range(self):
+        date_range_list = split_date_range(
+            date(2021, 1, 1), date(2021, 3, 1), 30)
+        self.assertEqual(date_range_list, [(date(2021, 1, 1), date(2021, 1, 31)),
+                                           (date(2021, 1, 31), date(2021, 3, 1))])
+
+    def test_resume(self):
+        unit_list = build_export_units(
+            ["1"], [(date(2021, 1, 1), date(2021, 3, 1))], shard_days=30)
+        self.assertEqual(len(unit_list), 4)
+
+        fb = mock.Mock()
+        fb.get_page_default_web_insight.return_value = {
+            "insight_list": [{}]}
+        # the second post unit fails, e.g. process crashes
+        fb.get_post_default_web_insight.side_effect = [
+            {"insight_list": [{}, {}]}, ValueError("network error")]
+        stats = Exporter(fb, self.out_dir, ExportJournal(
+            self.journal_path)).run(unit_list)
+        self.assertEqual((stats.done, stats.failed, stats.row_count), (3, 1, 4))
+
+        fb.reset_mock()
+        fb.get_post_default_web_insight.side_effect = None
+        fb.get_post_default_web_insight.return_value = {"insight_list": []}
+        stats = Exporter(fb, self.out_dir, ExportJournal(
+            self.journal_path)).run(unit_list)
+        self.assertEqual((stats.skipped, stats.done, stats.failed), (3, 1, 0))
+        fb.get_page_default_web_insight.assert_not_called()
+        self.assertEqual(fb.get_post_default_web_insight.call_count, 1)
+        self.assertTrue(os.path.exists(os.path.join(
+            self.out_dir, f"{ExportKind.post.value}_1_2021-01-31_2021-03-01.json")))
+
+    def test_period_change_is_not_skipped(self):
+        unit_list = build_export_units(
+            ["1"], [(date(2021, 1, 1), date(2021, 1, 31))], [ExportKind.page], shard_days=30)
+        fb = mock.Mock()
+        fb.get_page_default_web_insight.return_value = {"insight_list": [{}]}
+        Exporter(fb, self.out_dir, ExportJournal(self.journal_path),
+                 period=Period.week).run(unit_list)
+        stats = Exporter(fb, self.out_dir, ExportJournal(
+            self.journal_path), period=Period.month).run(unit_list)
+        self.assertEqual((stats.skipped, stats.done), (0, 1))
+        self.assertEqual(sorted(os.listdir(self.out_dir)), [
+            "journal.jsonl", "page_1_2021-01-01_2021-01-31_month.json", "page_1_2021-01-01_2021-01-31_week.json"])
+
+    def test_page_token_failure(self):
+        unit_list = build_export_units(
+            ["1", "2"], [(date(2021, 1, 1), date(2021, 1, 31))], shard_days=30)
+
+        def get_page_long_lived_token(page_id):
+            if page_id == "1":
+                raise ValueError("invalid token")
+            return "token"
+
+        fb = mock.Mock()
+        fb.get_page_long_lived_token.side_effect = get_page_long_lived_token
+        fb.get_page_default_web_insight.return_value = {"insight_list": [{}]}
+        fb.get_post_default_web_insight.return_value = {"insight_list": [{}]}
+        stats = Exporter(fb, self.out_dir, ExportJournal(
+            self.journal_path)).run(unit_list)
+        self.assertEqual((stats.done, stats.failed), (2, 2))
+        fb.get_page_default_web_insight.assert_called_once()
+        self.assertEqual(
+            fb.get_page_default_web_insight.call_args[0][0], "2")
+
+    def test_parse_date_range(self):
+        from python_fb_page_insights_client.cli import main
+        with mock.patch('sys.stderr'), self.assertRaises(SystemExit):
+            main(["export", "--date-range", "2021-03-01:2021-01-01"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+from python_fb_page_insights_client import FBPageInsight
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+import threading
+import time
+import unittest
+
+DAY = 86400
+
+
+def fake_post(post_id: str, timestamp: int):
+    from datetime import datetime
+    return {"id": post_id, "created_time": datetime.utcfromtimestamp(timestamp).strftime('%Y-%m-%dT%H:%M:%S+0000')}
+
+
+class FakeGraphAPI:
+    """ /posts with since/until, 2 posts per page """
+
+    def __init__(self, post_list):
+        self.post_list = post_list
+        self.lock = threading.Lock()
+        self.request_count = 0
+
+    def get_json(self, url: str, page_id: str = None):
+        with self.lock:
+            self.request_count += 1
+        query = parse_qs(urlparse(url).query)
+        since = int(query["since"][0])
+        until = int(query["until"][0])
+        offset = int(query.get("offset", ["0"])[0])
+        matched = [p for p in self.post_list if since <= p[1] <= until]
+        matched.sort(key=lambda p: p[1], reverse=True)
+        page = matched[offset:offset + 2]
+        resp = {"data": [fake_post(*p) for p in page], "paging": {}}
+        if offset + 2 < len(matched):
+            resp["paging"]["next"] = f"https://graph.facebook.com/v10.0/1/posts?since={since}&until={until}&offset={offset + 2}"
+        return resp
+
+
+class TestGetPosts(unittest.TestCase):
+    def test_shards(self):
+        post_list = [(f"1_{i}", 1600000000 + i * DAY // 2) for i in range(40)]
+        api = FakeGraphAPI(post_list)
+        fb = FBPageInsight(fb_default_page_id="1",
+                           fb_page_access_token_dict={"1": "token"})
+        since, until = 1600000000, 1600000000 + 20 * DAY
+        with mock.patch.object(FBPageInsight, "_get_json", side_effect=api.get_json):
+            sequential = fb.get_posts(since=since, until=until)
+            sharded = fb.get_posts(
+                since=since, until=until, shard_days=3, max_workers=4)
+        self.assertEqual([p.id for p in sharded.data],
+                         [p.id for p in sequential.data])
+        self.assertEqual(len(sharded.data), 40)
+        self.assertTrue(all(p.page_id == "1" for p in sharded.data))
+
+    def test_shard_error(self):
+        post_list = [(f"1_{i}", 1600000000 + i * DAY // 2) for i in range(40)]
+        api = FakeGraphAPI(post_list)
+        fb = FBPageInsight(fb_default_page_id="1",
+                           fb_page_access_token_dict={"1": "token"})
+        since, until = 1600000000, 1600000000 + 20 * DAY
+
+        def get_json(url, page_id=None):
+            # the second shard is throttled
+            if f"since={since + 3 * DAY}&" in url:
+                return {"error": {"code": 4, "message": "Application request limit reached"}}
+            return api.get_json(url, page_id)
+
+        with mock.patch.object(FBPageInsight, "_get_json", side_effect=get_json):
+            with self.assertRaisesRegex(ValueError, "Application request limit reached"):
+                fb.get_posts(since=since, until=until,
+                             shard_days=3, max_workers=4)
+            # without shards, the posts before the error are returned with it
+            resp = fb.get_posts(since=since + 3 * DAY, until=until)
+        self.assertEqual(resp.error.code, 4)
+        self.assertEqual(resp.data, [])
+
+    def test_session_created_once(self):
+        fb = FBPageInsight()
+        barrier = threading.Barrier(8)
+        session_list = []
+
+        def get_session():
+            barrier.wait(5)
+            session_list.append(fb._get_session())
+
+        with mock.patch("requests.Session", side_effect=lambda: time.sleep(0.05) or object()) as session_class:
+            thread_list = [threading.Thread(target=get_session)
+                           for _ in range(8)]
+            for thread in thread_list:
+                thread.start()
+            for thread in thread_list:
+                thread.join()
+        self.assertEqual(session_class.call_count, 1)
+        self.assertEqual(len({id(e) for e in session_list}), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
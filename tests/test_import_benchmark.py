@@ -0,0 +1,99 @@
+from python_fb_page_insights_client import fb_page_insight
+from python_fb_page_insights_client.fb_page_insight import FBPageInsight, PageDefaultWebInsight, _cached_partial_json_schema, _partial_json_schema
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+# generous limits, they only catch regressions like importing requests eagerly again.
+# wall-clock time depends on the machine, so they are only checked with FB_INSIGHTS_BENCHMARK=1
+IMPORT_SECONDS_LIMIT = 0.05
+CONSTRUCTION_SECONDS_LIMIT = 0.001
+RUN_BENCHMARK = os.environ.get("FB_INSIGHTS_BENCHMARK") == "1"
+
+
+class TestImportBenchmark(unittest.TestCase):
+    def test_import_is_lazy(self):
+        code = ("import sys, time, json\n"
+                "start = time.perf_counter()\n"
+                "import python_fb_page_insights_client\n"
+                "elapsed = time.perf_counter() - start\n"
+                "print(json.dumps({'elapsed': elapsed, 'modules': [m for m in ('requests', 'tinydb', 'pydantic', 'numpy') if m in sys.modules]}))")
+        result = json.loads(subprocess.check_output(
+            [sys.executable, "-c", code]).decode())
+        print(f"import: {result['elapsed'] * 1000:.2f}ms")
+        self.assertEqual(result["modules"], [])
+        if RUN_BENCHMARK:
+            self.assertLess(result["elapsed"], IMPORT_SECONDS_LIMIT)
+
+    def test_client_import_does_not_import_requests(self):
+        code = ("import sys\n"
+                "from python_fb_page_insights_client import FBPageInsight\n"
+                "FBPageInsight()\n"
+                "print(','.join(m for m in ('requests', 'tinydb') if m in sys.modules))")
+        output = subprocess.check_output([sys.executable, "-c", code]).decode()
+        self.assertEqual(output.strip(), "")
+
+    def test_construction(self):
+        FBPageInsight()
+        cache_size = len(fb_page_insight._env_settings_cache)
+        count = 200
+        start = time.perf_counter()
+        for _ in range(count):
+            FBPageInsight()
+        elapsed = (time.perf_counter() - start) / count
+        print(f"construction: {elapsed * 1000:.3f}ms")
+        if RUN_BENCHMARK:
+            self.assertLess(elapsed, CONSTRUCTION_SECONDS_LIMIT)
+        # one entry per settings class
+        self.assertIn(FBPageInsight, fb_page_insight._env_settings_cache)
+        self.assertEqual(
+            len(fb_page_insight._env_settings_cache), cache_size)
+
+    def test_env_change_is_read(self):
+        with mock.patch.dict(os.environ, {"FB_DEFAULT_PAGE_ID": "1"}):
+            self.assertEqual(FBPageInsight().fb_default_page_id, "1")
+        with mock.patch.dict(os.environ, {"FB_DEFAULT_PAGE_ID": "2"}):
+            self.assertEqual(FBPageInsight().fb_default_page_id, "2")
+
+    def test_schema_is_memoized(self):
+        _partial_json_schema(PageDefaultWebInsight)
+        hits = _cached_partial_json_schema.cache_info().hits
+        schema = _partial_json_schema(PageDefaultWebInsight)
+        self.assertEqual(
+            _cached_partial_json_schema.cache_info().hits, hits + 1)
+        # each result has its own copy
+        schema.properties.clear()
+        self.assertNotEqual(
+            _partial_json_schema(PageDefaultWebInsight).properties, {})
+
+    def test_env_files_change_is_read(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            first_path = os.path.join(tmp_dir, "first.env")
+            second_path = os.path.join(tmp_dir, "second.env")
+            with open(first_path, "w") as f:
+                f.write("fb_app_id=1\n")
+            with open(second_path, "w") as f:
+                f.write("fb_default_page_id=1\n")
+
+            class MultiEnvFBPageInsight(FBPageInsight):
+                class Config(FBPageInsight.Config):
+                    env_file = (first_path, second_path)
+
+            self.assertEqual(
+                MultiEnvFBPageInsight().fb_default_page_id, "1")
+            with open(second_path, "w") as f:
+                f.write("fb_default_page_id=22\n")
+            stat = os.stat(second_path)
+            os.utime(second_path, ns=(stat.st_atime_ns,
+                     stat.st_mtime_ns + 10 ** 9))
+            self.assertEqual(
+                MultiEnvFBPageInsight().fb_default_page_id, "22")
+
+
+if __name__ == '__main__':
+    unittest.main()
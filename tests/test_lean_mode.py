@@ -0,0 +1,53 @@
+from python_fb_page_insights_client import FBPageInsight
+from python_fb_page_insights_client.fb_page_insight import LeanInsightsResponse
+from unittest import mock
+import unittest
+
+
+class TestLeanMode(unittest.TestCase):
+    def setUp(self):
+        self.url_list = []
+
+    def fake_get_json(self, url: str, page_id: str = None):
+        self.url_list.append(url)
+        if "/posts" in url:
+            return {"data": [{"id": "1_a", "created_time": "2021-08-07T07:00:00+0000"}], "paging": {}}
+        # lean responses have no id/title/description
+        return {"data": [
+            {"name": "post_impressions_organic_unique",
+                "period": "lifetime", "values": [{"value": 10}]},
+            {"name": "post_clicks_by_type", "period": "lifetime",
+                "values": [{"value": {"link clicks": 3}}]},
+        ]}
+
+    def test_post_default_web_insight(self):
+        fb = FBPageInsight(fb_default_page_id="1", fb_page_access_token_dict={
+                           "1": "token"}, lean_mode=True)
+        with mock.patch.object(FBPageInsight, "_get_json", side_effect=self.fake_get_json):
+            resp = fb.get_post_default_web_insight()
+        # default /posts fields are already the PostData ones
+        self.assertNotIn("fields=", self.url_list[0])
+        self.assertIn("fields=name,period,values", self.url_list[1])
+        insight = resp.insight_list[0]
+        self.assertEqual((insight.reach, insight.link_clicks), (10, 3))
+
+    def test_composite_data_keeps_lean_insight(self):
+        from python_fb_page_insights_client.fb_page_insight import LeanInsightData, PostCompositeData, PostData
+        composite_data = PostCompositeData(meta=PostData(id="1_a", created_time="2021-08-07T07:00:00+0000"),
+                                           insight_data=[{"name": "post_clicks", "period": "lifetime", "values": [{"value": 1}]}])
+        self.assertIsInstance(
+            composite_data.insight_data[0], LeanInsightData)
+
+    def test_page_insights(self):
+        fb = FBPageInsight(fb_default_page_id="1", fb_page_access_token_dict={
+                           "1": "token"}, lean_mode=True)
+        with mock.patch.object(FBPageInsight, "_get_json", return_value={"data": [
+                {"name": "page_views_total", "period": "week", "values": [{"value": 5, "end_time": "2021-08-07T07:00:00+0000"}]}]}):
+            resp = fb.get_page_insights()
+            page_insight = fb.get_page_default_web_insight()
+        self.assertIsInstance(resp, LeanInsightsResponse)
+        self.assertEqual(page_insight.insight_list[0].page_views, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+from python_fb_page_insights_client.export import ExportKind, build_export_units
+from python_fb_page_insights_client.planner import BackfillPlan, BackfillPlanner, PlannerConst
+from datetime import date
+from unittest import mock
+import os
+import tempfile
+import unittest
+
+
+class TestBackfillPlanner(unittest.TestCase):
+    def setUp(self):
+        self.unit_list = build_export_units(
+            ["1", "2"], [(date(2021, 1, 1), date(2021, 3, 2))], shard_days=30)
+
+    def test_dry_run(self):
+        fb = mock.Mock()
+        plan = BackfillPlanner(fb, hourly_request_budget=100,
+                               posts_per_day=2).plan(self.unit_list, dry_run=True)
+        fb.get_posts.assert_not_called()
+        # per page: 2 page units + 2 post units of 60 posts (3 pagination pages + 60 insights)
+        self.assertEqual(plan.estimated_request_count,
+                         2 * (2 + 2 * 63) + 2 * PlannerConst.token_request_count_per_page)
+        self.assertEqual(plan.estimated_hours, len(plan.shard_list))
+        for shard in plan.shard_list:
+            self.assertLessEqual(shard.estimated_request_count, 100)
+        self.assertEqual(sum(len(shard.planned_unit_list)
+                         for shard in plan.shard_list), len(self.unit_list))
+
+    def test_count_posts_by_api(self):
+        fb = mock.Mock()
+        fb.get_posts.return_value.data = [object()] * 30
+        fb.get_posts.return_value.error = None
+        plan = BackfillPlanner(fb).plan(self.unit_list, dry_run=False)
+        self.assertEqual(fb.get_posts.call_count, 4)
+        post_unit = plan.shard_list[0].planned_unit_list[1]
+        self.assertEqual(
+            (post_unit.post_count, post_unit.estimated_request_count), (30, 32))
+
+    def test_save_load(self):
+        plan = BackfillPlanner().plan(self.unit_list)
+        plan.period = "month"
+        plan.journal = "journal.jsonl"
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "plan.json")
+            plan.save(path)
+            self.assertEqual(BackfillPlan.load(path), plan)
+
+    def test_run_plan_command_uses_plan_settings(self):
+        from python_fb_page_insights_client.cli import main
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            out_dir = os.path.join(tmp_dir, "out")
+            plan_file = os.path.join(tmp_dir, "plan.json")
+            with mock.patch("python_fb_page_insights_client.cli.FBPageInsight"), mock.patch("builtins.print"):
+                main(["plan", "--page-id", "1", "--date-range", "2021-01-01:2021-02-01", "--dry-run",
+                      "--period", "month", "--out-dir", out_dir, "--concurrency", "2", "--plan-file", plan_file])
+                with mock.patch("python_fb_page_insights_client.cli.run_plan", return_value={}), \
+                        mock.patch("python_fb_page_insights_client.cli.Exporter") as exporter_class:
+                    main(["run-plan", "--plan-file", plan_file])
+            _, exporter_out_dir, journal, concurrency, period = exporter_class.call_args[0]
+            self.assertEqual((exporter_out_dir, concurrency, period.name),
+                             (out_dir, 2, "month"))
+            self.assertEqual(journal.path, os.path.join(
+                out_dir, "journal.jsonl"))
+
+    def test_page_unit_shard_days(self):
+        with self.assertRaises(ValueError):
+            build_export_units(
+                ["1"], [(date(2021, 1, 1), date(2021, 7, 1))], shard_days=120)
+        unit_list = build_export_units(
+            ["1"], [(date(2021, 1, 1), date(2021, 7, 1))], [ExportKind.post], shard_days=120)
+        self.assertEqual(len(unit_list), 2)
+        planned_unit = BackfillPlanner().estimate_unit(build_export_units(
+            ["1"], [(date(2021, 1, 1), date(2021, 4, 1))], [ExportKind.page], shard_days=93)[0])
+        self.assertEqual(planned_unit.estimated_request_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
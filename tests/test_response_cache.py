@@ -0,0 +1,108 @@
+from python_fb_page_insights_client.response_cache import ResponseCache
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_ttl(self):
+        cache = ResponseCache(endpoint_ttl={"insights": 100})
+        fetch = mock.Mock(return_value={"data": []})
+        cache.get_or_fetch("insights", "k", fetch)
+        cache.get_or_fetch("insights", "k", fetch)
+        self.assertEqual(fetch.call_count, 1)
+        with mock.patch("time.time", return_value=time.time() + 101):
+            cache.get_or_fetch("insights", "k", fetch)
+        self.assertEqual(fetch.call_count, 2)
+
+    def test_error_not_cached(self):
+        cache = ResponseCache()
+        fetch = mock.Mock(return_value={"error": {"code": 4, "message": ""}})
+        cache.get_or_fetch("insights", "k", fetch)
+        cache.get_or_fetch("insights", "k", fetch)
+        self.assertEqual(fetch.call_count, 2)
+
+    def test_lru(self):
+        cache = ResponseCache(max_entries=2)
+        fetch = mock.Mock(return_value={"data": []})
+        for key in ["a", "b", "a", "c", "a", "b"]:
+            cache.get_or_fetch("posts", key, fetch)
+        # b is evicted by c since a was used more recently
+        self.assertEqual(fetch.call_count, 4)
+
+    def test_disk(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "cache.sqlite3")
+            ResponseCache(disk_path=path).get_or_fetch(
+                "posts", "k", lambda: {"data": [1]})
+            fetch = mock.Mock()
+            value = ResponseCache(disk_path=path).get_or_fetch(
+                "posts", "k", fetch)
+            self.assertEqual(value, {"data": [1]})
+            fetch.assert_not_called()
+
+    def test_disk_io_without_lock(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = ResponseCache(disk_path=os.path.join(
+                tmp_dir, "cache.sqlite3"))
+            cache.get_or_fetch("posts", "hot", lambda: {"data": []})
+            disk_reading = threading.Event()
+            release = threading.Event()
+            get_disk = cache._get_disk
+
+            def slow_get_disk(key, now):
+                disk_reading.set()
+                release.wait(5)
+                return get_disk(key, now)
+
+            with mock.patch.object(cache, "_get_disk", side_effect=slow_get_disk), ThreadPoolExecutor(1) as executor:
+                future = executor.submit(
+                    cache.get_or_fetch, "posts", "cold", lambda: {"data": [1]})
+                disk_reading.wait(5)
+                # a memory hit of another key does not wait for the disk read
+                start = time.time()
+                cache.get_or_fetch("posts", "hot", mock.Mock())
+                self.assertLess(time.time() - start, 1)
+                release.set()
+                self.assertEqual(future.result(), {"data": [1]})
+
+    def test_key_includes_api_version(self):
+        from python_fb_page_insights_client import FBPageInsight
+        cache = ResponseCache()
+        fetch_dict = {}
+        for api_version in ["v10.0", "v11.0"]:
+            fb = FBPageInsight(api_version=api_version, fb_page_access_token_dict={
+                               "1": "token"}).use_response_cache(cache)
+            with mock.patch.object(FBPageInsight, "_get_json", return_value={"data": [api_version]}) as get_json:
+                fetch_dict[api_version] = fb.compose_fb_graph_api_page_request(
+                    "1", "posts")
+                self.assertEqual(get_json.call_count, 1)
+        self.assertEqual(fetch_dict["v11.0"], {"data": ["v11.0"]})
+
+    def test_coalescing(self):
+        cache = ResponseCache()
+        release = threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            release.wait(5)
+            return {"data": []}
+
+        with ThreadPoolExecutor(8) as executor:
+            futures = [executor.submit(
+                cache.get_or_fetch, "insights", "k", fetch) for _ in range(8)]
+            while cache.coalesced < 7:
+                time.sleep(0.01)
+            release.set()
+            results = [f.result() for f in futures]
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(r == {"data": []} for r in results))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+from python_fb_page_insights_client import FBPageInsight
+from python_fb_page_insights_client.fb_page_insight import PostData, PostsResponse, InsightsResponse
+from python_fb_page_insights_client.scheduler import PostInsightScheduler
+from unittest import mock
+import unittest
+
+
+def make_post(post_id: str, created_time: str):
+    return PostData(id=post_id, created_time=created_time)
+
+
+class TestPostInsightScheduler(unittest.TestCase):
+    def setUp(self):
+        self.posts = [make_post("1_a", "2021-08-01T07:00:00+0000"),
+                      make_post("1_b", "2021-08-07T07:00:00+0000"),
+                      make_post("1_c", "2021-08-03T07:00:00+0000")]
+
+    def test_newest_first_within_budget(self):
+        schedule = PostInsightScheduler(request_budget=2).schedule(self.posts)
+        self.assertEqual([p.id for p in schedule.scheduled], ["1_b", "1_c"])
+        self.assertEqual([p.id for p in schedule.deferred], ["1_a"])
+
+    def test_no_budget(self):
+        schedule = PostInsightScheduler().schedule(self.posts)
+        self.assertEqual(len(schedule.scheduled), 3)
+        self.assertEqual(schedule.deferred, [])
+
+    def test_defer_on_throttle(self):
+        fb = FBPageInsight(fb_default_page_id="1")
+        throttled = InsightsResponse(
+            error={"code": 4, "message": "Application request limit reached"})
+        ok = InsightsResponse(data=[])
+        with mock.patch.object(FBPageInsight, "get_posts", return_value=PostsResponse(data=self.posts)), \
+                mock.patch.object(FBPageInsight, "get_post_insight", side_effect=[ok, throttled]):
+            resp = fb.get_post_default_web_insight()
+        self.assertEqual([p.id for p in resp.post_list], ["1_b"])
+        self.assertEqual([p.id for p in resp.deferred_post_list], [
+                         "1_c", "1_a"])
+
+
+if __name__ == '__main__':
+    unittest.main()
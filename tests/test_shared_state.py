@@ -0,0 +1,60 @@
+from python_fb_page_insights_client.shared_state import SharedState
+from multiprocessing import Pool
+import os
+import sqlite3
+import tempfile
+import unittest
+
+
+def take_tokens(path: str):
+    state = SharedState(path)
+    taken = 0
+    for _ in range(5):
+        if state.try_acquire("app", capacity=10, refill_per_second=0.0001) == 0:
+            taken += 1
+    return taken
+
+
+class TestSharedState(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "state.sqlite3")
+        self.state = SharedState(self.path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_page_token(self):
+        self.assertIsNone(self.state.get_page_token("1"))
+        self.state.set_page_token("1", "token")
+        self.assertEqual(SharedState(self.path).get_page_token("1"), "token")
+
+    def test_usage(self):
+        self.state.add_usage("app")
+        self.state.add_usage("app", 2)
+        self.assertEqual(self.state.get_usage("app"), 3)
+        self.assertEqual(self.state.get_usage("page:1"), 0)
+
+    def test_bucket_timeout(self):
+        self.assertTrue(self.state.acquire("app", 1, 0.0001))
+        self.assertFalse(self.state.acquire("app", 1, 0.0001, timeout=0.01))
+
+    def test_locked_error_is_not_hidden(self):
+        locker = sqlite3.connect(self.path, isolation_level=None)
+        self.state.get_usage("app")  # create tables first
+        locker.execute("BEGIN IMMEDIATE")
+        try:
+            with self.assertRaisesRegex(sqlite3.OperationalError, "locked"):
+                SharedState(self.path, timeout=0.01).add_usage("app")
+        finally:
+            locker.execute("ROLLBACK")
+            locker.close()
+
+    def test_bucket_shared_by_processes(self):
+        with Pool(4) as pool:
+            taken = pool.map(take_tokens, [self.path] * 4)
+        self.assertEqual(sum(taken), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+from python_fb_page_insights_client.fb_page_insight import PageDefaultWebInsight, PageWebInsightData, PostData, PostDefaultWebInsight, PostsWebInsightData
+from python_fb_page_insights_client.shared_state import SharedState
+from python_fb_page_insights_client.snapshot_diff import SnapshotDiffer, SnapshotStore
+from python_fb_page_insights_client import FBPageInsight
+from unittest import mock
+import os
+import tempfile
+import unittest
+
+
+def make_posts_data(reach_dict, query_time):
+    return PostsWebInsightData(
+        insight_list=[PostDefaultWebInsight(post_id=post_id, reach=reach, query_time=query_time)
+                      for post_id, reach in reach_dict.items()],
+        post_list=[PostData(id=post_id, created_time="2021-08-07T07:00:00+0000") for post_id in reach_dict])
+
+
+class TestSnapshotDiff(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "state.sqlite3")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_posts(self):
+        differ = SnapshotDiffer(SnapshotStore(SharedState(self.path)))
+        delta = differ.diff_posts("1", make_posts_data(
+            {"1_a": 1, "1_b": 2}, "2021-08-07T07:00:00"))
+        self.assertEqual(len(delta.insert_list), 2)
+
+        # query_time is not compared, and a new differ reads the stored fingerprints
+        differ = SnapshotDiffer(SnapshotStore(SharedState(self.path)))
+        delta = differ.diff_posts("1", make_posts_data(
+            {"1_a": 1, "1_b": 3, "1_c": 0}, "2021-08-08T07:00:00"))
+        self.assertEqual([e.post_id for e in delta.insert_list], ["1_c"])
+        self.assertEqual([e.post_id for e in delta.update_list], ["1_b"])
+        self.assertEqual(delta.unchanged_count, 1)
+        self.assertEqual([e.id for e in delta.post_list], ["1_b", "1_c"])
+
+    def test_no_commit(self):
+        differ = SnapshotDiffer(SnapshotStore(SharedState(self.path)))
+        data = make_posts_data({"1_a": 1}, None)
+        differ.diff_posts("1", data, commit=False)
+        self.assertEqual(len(differ.diff_posts("1", data).insert_list), 1)
+        self.assertEqual(differ.diff_posts("1", data).unchanged_count, 1)
+
+    def test_page(self):
+        differ = SnapshotDiffer(SnapshotStore(SharedState(self.path)))
+        insight = PageDefaultWebInsight(
+            page_id="1", end_time="2021-08-07T07:00:00+0000", period="week", page_views=1)
+        differ.diff_page("1", PageWebInsightData(insight_list=[insight]))
+        insight.page_views = 2
+        delta = differ.diff_page(
+            "1", PageWebInsightData(insight_list=[insight]))
+        self.assertEqual(delta.update_list, [insight])
+        # another page has its own snapshot
+        delta = differ.diff_page(
+            "2", PageWebInsightData(insight_list=[insight]))
+        self.assertEqual(len(delta.insert_list), 1)
+
+    def test_only_changed_rows_are_written(self):
+        shared_state = SharedState(self.path)
+        differ = SnapshotDiffer(SnapshotStore(shared_state))
+        differ.diff_posts("1", make_posts_data({"1_a": 1, "1_b": 2}, None))
+        with mock.patch.object(shared_state, "set_fingerprints", wraps=shared_state.set_fingerprints) as set_fingerprints:
+            differ.diff_posts("1", make_posts_data({"1_a": 1, "1_b": 3}, None))
+        self.assertEqual(list(set_fingerprints.call_args[0][2]), ["1_b"])
+        self.assertEqual(
+            set(shared_state.get_fingerprints("post", "1")), {"1_a", "1_b"})
+
+    def test_delta_uses_shared_state(self):
+        fb = FBPageInsight(fb_shared_state_path=self.path)
+        data = make_posts_data({"1_a": 1}, None)
+        data.deferred_post_list = [
+            PostData(id="1_b", created_time="2021-08-06T07:00:00+0000")]
+        with mock.patch.object(FBPageInsight, "get_post_default_web_insight", return_value=data) as get_insight:
+            delta = fb.get_post_default_web_insight_delta(
+                "1", between_days=7, request_budget=2)
+        self.assertEqual(get_insight.call_args[1]["request_budget"], 2)
+        self.assertEqual([e.id for e in delta.deferred_post_list], ["1_b"])
+        self.assertEqual(
+            list(SharedState(self.path).get_fingerprints("post", "1")), ["1_a"])
+
+
+if __name__ == '__main__':
+    unittest.main()